@@ -1,6 +1,8 @@
 import time
-from typing import Any, Callable, Iterator, Union, Optional, TypeVar
-from functools import wraps
+from typing import Any, AsyncIterator, Callable, Iterator, Union, Optional, TypeVar
+from functools import wraps, partial
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import asyncio
 import inspect
 import random
 
@@ -9,14 +11,164 @@ __all__ = ["repeat"]
 # 定义可调用类型变量
 F = TypeVar('F', bound=Callable[..., Any])
 
+# 固定速率模式下错过节拍的处理策略
+MISSED_POLICIES = {'skip', 'coalesce', 'catchup'}
+
+
+def _schedule(cnt) -> Iterator[bool]:
+    """
+    按 cnt 产生执行节奏：False 表示执行一次，True 表示两次执行之间等待一次
+    
+    等待由调用方完成（同步 sleep、asyncio.sleep 或固定速率节拍），同步与协程共用同一节奏
+    
+    - 可调用对象: 每次执行前询问，返回False时停止（等待发生在询问之前）
+    - 整数: 正数为执行次数（最后一次后不等待），负数无限循环，零不执行
+    - 其他类型: 转换为布尔值，True时执行一次
+    """
+    # 情况1: cnt是可调用对象（条件函数）
+    if callable(cnt):
+        while cnt():
+            yield False
+            yield True
+    # 情况2: cnt是整数
+    elif isinstance(cnt, int):
+        # 负数表示无限循环
+        if cnt < 0:
+            while True:
+                yield False
+                yield True
+        # 正数执行指定次数，最后一次不延迟；零表示不执行
+        for i in range(cnt):
+            if i:
+                yield True
+            yield False
+    # 情况3: 其他类型（转换为布尔值判断）
+    elif cnt:
+        yield False
+
+
+def _run_concurrent(events: Iterator[bool], pause: Callable[[], None],
+                    call: Callable[[], Any], concurrency: int) -> Iterator[Any]:
+    """在线程池上按节奏提交执行，至多 concurrency 个同时进行，按完成顺序产生结果"""
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='repeat')
+    pending = set()
+    try:
+        for is_pause in events:
+            if is_pause:
+                pause()
+                continue
+            # 并发已满时等待任一完成；否则顺带取出已完成的结果
+            if len(pending) >= concurrency:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            else:
+                done = {f for f in pending if f.done()}
+                pending -= done
+            for future in done:
+                yield future.result()
+            pending.add(pool.submit(call))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        # 迭代提前结束或出错时，取消尚未开始的执行
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def _arun_concurrent(events: Iterator[bool], pause: Callable[[], Any],
+                           make: Callable[[], Any], concurrency: int) -> AsyncIterator[Any]:
+    """_run_concurrent 的协程版本：执行为同一事件循环上的任务"""
+    pending = set()
+    try:
+        for is_pause in events:
+            if is_pause:
+                await pause()
+                continue
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            else:
+                done = {t for t in pending if t.done()}
+                pending -= done
+            for task in done:
+                yield task.result()
+            pending.add(asyncio.ensure_future(make()))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class _FixedRate:
+    """
+    固定速率节拍：第 k 次执行安排在单调时钟上的 起点 + k * period，
+    执行耗时不会累积为周期漂移
+    
+    执行超时错过节拍时按 missed 策略处理:
+        - 'skip': 丢弃错过的节拍，等到下一个未来节拍再执行
+        - 'coalesce': 错过的节拍合并为一次，立即执行，之后回到原节拍
+        - 'catchup': 错过的节拍逐个补执行，不等待，直到追上节拍
+    
+    创建时刻即首次执行的节拍；每次执行前以 (滞后秒数, 丢弃或合并的节拍数) 调用 on_lag
+    """
+    def __init__(self, period: float, missed: str, on_lag: Optional[Callable[[float, int], None]]):
+        self.period = period
+        self.missed = missed
+        self.on_lag = on_lag
+        self.tick = time.monotonic()
+    
+    def __call__(self):
+        wait = self._advance()
+        if wait > 0:
+            time.sleep(wait)
+        self._report()
+    
+    async def wait(self):
+        """协程版本的等待，用 asyncio.sleep 等到下一个节拍"""
+        await asyncio.sleep(self._advance())
+        self._report()
+    
+    def _advance(self) -> float:
+        """推进到下一个要执行的节拍，返回需要等待的秒数"""
+        self.tick += self.period
+        now = time.monotonic()
+        skipped = 0
+        if now > self.tick and self.missed != 'catchup':
+            # 已错过的节拍数（含本次）
+            late = int((now - self.tick) // self.period) + 1
+            if self.missed == 'skip':
+                self.tick += late * self.period
+                skipped = late
+            else:  # 'coalesce'
+                self.tick += (late - 1) * self.period
+                skipped = late - 1
+        self.skipped = skipped
+        return max(0.0, self.tick - now)
+    
+    def _report(self):
+        if self.on_lag is not None:
+            self.on_lag(time.monotonic() - self.tick, self.skipped)
+
+
+def _no_pause():
+    pass
+
+
 def repeat(
     cnt: Union[int, Callable[[], bool], Any] = 1, 
-    delay: float = 0
+    delay: float = 0,
+    fixed_rate: bool = False,
+    missed: str = 'skip',
+    on_lag: Optional[Callable[[float, int], None]] = None,
+    concurrency: int = 1
 ) -> Callable[[F], F]:
     """
     重复执行被装饰函数的装饰器工厂
     
     此装饰器创建一个生成器，可多次执行被装饰函数，每次执行后可选延迟。
+    装饰 async def 函数时创建异步生成器，用 async for 迭代。
     支持多种调用模式：
     1. 固定次数重复
     2. 无限重复（直到手动中断）
@@ -31,15 +183,27 @@ def repeat(
             - 可调用对象: 每次迭代前调用，返回False时停止
             - 其他类型: 转换为布尔值，True时执行一次，False时不执行
         delay: 每次调用后的延迟时间（秒），0表示无延迟
+        fixed_rate: 固定速率模式。True时 delay 为执行周期，按单调时钟上的绝对节拍执行，
+            实际周期不受执行耗时影响。默认: False
+        missed: 固定速率模式下错过节拍的处理策略:
+            - 'skip': 丢弃错过的节拍，等到下一个未来节拍
+            - 'coalesce': 错过的节拍合并为一次立即执行
+            - 'catchup': 逐个补执行错过的节拍
+            默认: 'skip'
+        on_lag: 固定速率模式下每次执行前调用 on_lag(滞后秒数, 丢弃或合并的节拍数)，用于监控。默认: None
+        concurrency: 同时进行的执行数上限。大于1时同步函数在线程池上执行、协程函数作为任务执行，
+            delay 与固定速率约束的是相邻两次执行的开始时刻，结果按完成顺序产生。默认: 1
     
     返回:
-        装饰器函数：返回生成器迭代器，每次迭代产生函数返回值
+        装饰器函数：返回生成器迭代器（协程函数为异步生成器），每次迭代产生函数返回值
     
     注意事项:
         1. 不适用于生成器函数（yield函数）
         2. 装饰类方法时自动传递self/cls
         3. 参数验证基于函数签名
-        4. 延迟使用time.sleep()实现
+        4. 延迟使用time.sleep()实现，协程函数使用asyncio.sleep()
+        5. 默认模式下实际周期为 delay + 执行耗时；需要稳定频率时使用 fixed_rate
+        6. 并发模式下提前结束迭代会取消尚未开始的执行
     
     示例:
         >>> # 示例1: 固定次数调用
@@ -95,7 +259,46 @@ def repeat(
         ...
         >>> list(no_run())
         []
+        
+        >>> # 示例6: 固定速率轮询，每0.5秒一次，不随执行耗时漂移
+        >>> @repeat(cnt=-1, delay=0.5, fixed_rate=True, missed='skip',
+        ...         on_lag=lambda lag, skipped: skipped and print(f"丢弃 {skipped} 个节拍"))
+        ... def poll():
+        ...     return fetch_status()
+        
+        >>> # 示例7: 并发执行与协程函数
+        >>> @repeat(cnt=100, concurrency=8)
+        ... def hit(url):
+        ...     return requests.get(url).status_code
+        ...
+        >>> @repeat(cnt=3, delay=1)
+        ... async def ping(host):
+        ...     return await probe(host)
+        ...
+        >>> async for status in ping("example.com"):
+        ...     print(status)
     """
+    if fixed_rate:
+        if delay <= 0:
+            raise ValueError(f"固定速率模式需要正数周期 delay，而不是 {delay}")
+        if missed not in MISSED_POLICIES:
+            raise ValueError(f"无效的节拍策略: {missed}. 有效值: {MISSED_POLICIES}")
+    if not isinstance(concurrency, int) or concurrency < 1:
+        raise ValueError(f"concurrency 需要是正整数，而不是 {concurrency}")
+    
+    def sleep():
+        time.sleep(delay)
+    
+    def new_pause() -> Callable[[], None]:
+        if fixed_rate:
+            return _FixedRate(delay, missed, on_lag)
+        return sleep if delay > 0 else _no_pause
+    
+    def new_apause() -> Callable[[], Any]:
+        if fixed_rate:
+            return _FixedRate(delay, missed, on_lag).wait
+        return partial(asyncio.sleep, delay)
+    
     def decorator(func: F) -> F:
         # 分析函数签名
         sig = inspect.signature(func)
@@ -116,57 +319,54 @@ def repeat(
                 has_var_keyword = True
                 
         min_args_count = len(required_params)
+        # 参数验证所需信息在装饰时一次算好
+        max_args_count = None if has_var_positional else len(sig.parameters)
+        valid_params = None if has_var_keyword else frozenset(sig.parameters)
         
-        @wraps(func)
-        def wrapper(*args, **kwargs) -> Iterator[Any]:
-            # 参数验证
+        def check_args(args, kwargs):
             if len(args) + len(kwargs) < min_args_count:
                 raise TypeError(f"缺少必选参数: 需要至少 {min_args_count} 个参数")
                 
-            if not has_var_positional and len(args) > len(sig.parameters):
-                raise TypeError(f"位置参数过多: 最多接受 {len(sig.parameters)} 个位置参数")
+            if max_args_count is not None and len(args) > max_args_count:
+                raise TypeError(f"位置参数过多: 最多接受 {max_args_count} 个位置参数")
                 
-            if not has_var_keyword:
-                valid_params = set(sig.parameters.keys())
-                extra_kwargs = set(kwargs.keys()) - valid_params
-                if extra_kwargs:
-                    raise TypeError(f"无效关键字参数: {', '.join(extra_kwargs)}")
-            
-            # 执行逻辑
-            # 情况1: cnt是可调用对象（条件函数）
-            if callable(cnt):
-                while True:
-                    if not cnt():  # 条件为False时停止
-                        break
-                    result = func(*args, **kwargs)
-                    yield result
-                    if delay > 0:
-                        time.sleep(delay)
-            
-            # 情况2: cnt是整数
-            elif isinstance(cnt, int):
-                # 负数表示无限循环
-                if cnt < 0:
-                    while True:
-                        result = func(*args, **kwargs)
+            if valid_params is not None and not valid_params.issuperset(kwargs):
+                extra_kwargs = set(kwargs) - valid_params
+                raise TypeError(f"无效关键字参数: {', '.join(extra_kwargs)}")
+        
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def awrapper(*args, **kwargs) -> AsyncIterator[Any]:
+                check_args(args, kwargs)
+                
+                pause = new_apause()
+                if concurrency > 1:
+                    async for result in _arun_concurrent(_schedule(cnt), pause, partial(func, *args, **kwargs),
+                                                         concurrency):
                         yield result
-                        if delay > 0:
-                            time.sleep(delay)
-                # 零表示不执行
-                elif cnt == 0:
                     return
-                # 正数执行指定次数
-                else:
-                    for i in range(cnt):
-                        result = func(*args, **kwargs)
-                        yield result
-                        # 最后一次不延迟
-                        if i < cnt - 1 and delay > 0:
-                            time.sleep(delay)
+                for is_pause in _schedule(cnt):
+                    if is_pause:
+                        await pause()
+                    else:
+                        yield await func(*args, **kwargs)
             
-            # 情况3: 其他类型（转换为布尔值判断）
-            else:
-                if bool(cnt):
+            return awrapper  # type: ignore
+        
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> Iterator[Any]:
+            # 参数验证
+            check_args(args, kwargs)
+            
+            # 执行逻辑
+            pause = new_pause()
+            if concurrency > 1:
+                yield from _run_concurrent(_schedule(cnt), pause, partial(func, *args, **kwargs), concurrency)
+                return
+            for is_pause in _schedule(cnt):
+                if is_pause:
+                    pause()
+                else:
                     yield func(*args, **kwargs)
         
         return wrapper  # type: ignore
@@ -264,5 +464,63 @@ if __name__ == '__main__':
     except TypeError as e:
         print(f"预期错误: {e}")
     
+    # 测试6: 固定速率
+    print("\n=== 测试6: 固定速率 ===")
+    
+    def work() -> float:
+        # 执行耗时0.03秒，默认模式下实际周期为0.13秒
+        time.sleep(0.03)
+        return time.monotonic()
+    
+    drifting = repeat(cnt=6, delay=0.1)(work)
+    steady = repeat(cnt=6, delay=0.1, fixed_rate=True)(work)
+    for name, f in (("默认模式", drifting), ("固定速率", steady)):
+        stamps = list(f())
+        print(f"{name}平均周期: {(stamps[-1] - stamps[0]) / (len(stamps) - 1):.3f}秒")
+    
+    # 测试6.1: 执行超时时跳过错过的节拍并报告滞后
+    durations = iter([0.25, 0.01, 0.01, 0.01])
+    
+    @repeat(cnt=4, delay=0.1, fixed_rate=True, missed='skip',
+            on_lag=lambda lag, skipped: print(f"滞后 {lag * 1000:.1f}ms，丢弃 {skipped} 个节拍"))
+    def sometimes_slow() -> str:
+        time.sleep(next(durations))
+        return "tick"
+    
+    print("跳过策略结果:", list(sometimes_slow()))
+    
+    # 测试7: 并发执行，结果按完成顺序产生
+    print("\n=== 测试7: 并发执行 ===")
+    
+    @repeat(cnt=8, concurrency=4)
+    def fetch() -> float:
+        cost = random.choice([0.05, 0.2])
+        time.sleep(cost)
+        return cost
+    
+    start = time.perf_counter()
+    print("并发结果:", list(fetch()), f"耗时: {time.perf_counter() - start:.2f}秒")
+    
+    # 测试8: 协程函数，异步生成器
+    print("\n=== 测试8: 协程函数 ===")
+    
+    @repeat(cnt=3, delay=0.1)
+    async def aping(host: str) -> str:
+        await asyncio.sleep(0.05)
+        return f"pong from {host}"
+    
+    @repeat(cnt=6, concurrency=3)
+    async def afetch() -> float:
+        cost = random.choice([0.05, 0.2])
+        await asyncio.sleep(cost)
+        return cost
+    
+    async def amain():
+        print("协程结果:", [r async for r in aping("localhost")])
+        start = time.perf_counter()
+        print("协程并发结果:", [r async for r in afetch()], f"耗时: {time.perf_counter() - start:.2f}秒")
+    
+    asyncio.run(amain())
+    
     print("\n所有测试完成!")
     sys.exit(0)
\ No newline at end of file
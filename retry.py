@@ -1,9 +1,786 @@
 import time
 from typing import Any, Callable, Tuple, Type, Optional, Union
-from functools import wraps
+from functools import wraps, partial
+from concurrent.futures import Executor, Future, InvalidStateError, ThreadPoolExecutor, wait as wait_futures, FIRST_COMPLETED
+from itertools import count
+import heapq
+import os
+import asyncio
+import contextvars
+import inspect
 import logging
+import random
+import threading
+from collections import Counter, deque
+
+__all__ = ["retry", "RetryBudget", "CircuitBreaker", "CircuitOpenError", "PartialBatchError", "RetryMetrics"]
+
+class CircuitOpenError(Exception):
+    """断路器处于打开状态，调用被直接拒绝"""
+
+
+class PartialBatchError(Exception):
+    """
+    批量模式下重试用尽后仍有失败项
+    
+    results 为按原顺序合并的逐项结果，失败项位置为其最后一次的异常或未通过检查的返回值；
+    failed 为失败项的下标列表
+    """
+    def __init__(self, results: list, failed: list):
+        super().__init__(f"{len(failed)}/{len(results)} 项重试后仍失败，下标: {failed[:10]}")
+        self.results = results
+        self.failed = failed
+
+class RetryBudget:
+    """
+    重试预算：多个被装饰函数共享的令牌桶，限制故障期间的总重试量
+    
+    每次重试消耗 1 个令牌，每次成功调用（无需再重试）补充 ratio 个令牌，
+    令牌不超过 capacity。下游整体故障时成功变少、令牌很快耗尽，
+    重试流量被限制在成功流量的 ratio 倍左右，不会成倍放大下游压力。
+    
+    参数:
+        ratio: 每次成功调用补充的令牌数，即允许的重试/成功比例。默认: 0.1
+        capacity: 令牌上限，也是初始令牌数，允许的突发重试量。默认: 10
+    
+    使用示例:
+    
+    >>> budget = RetryBudget(ratio=0.2, capacity=20)
+    >>>
+    >>> @retry(tries=5, delay=0.1, budget=budget)
+    >>> def call_a(): ...
+    >>>
+    >>> @retry(tries=5, delay=0.1, budget=budget)
+    >>> def call_b(): ...
+    """
+    def __init__(self, ratio: float = 0.1, capacity: float = 10):
+        if ratio < 0 or capacity < 1:
+            raise ValueError(f"无效的重试预算: ratio={ratio}, capacity={capacity}")
+        self.ratio = ratio
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._lock = threading.Lock()
+    
+    @property
+    def tokens(self) -> float:
+        """当前剩余令牌数"""
+        return self._tokens
+    
+    def deposit(self):
+        """记录一次成功调用，补充令牌"""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+    
+    def withdraw(self) -> bool:
+        """申请一次重试，令牌不足时返回 False"""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+    
+    def __repr__(self):
+        return f"RetryBudget(ratio={self.ratio}, capacity={self.capacity}, tokens={self._tokens:.2f})"
+
+
+class CircuitBreaker:
+    """
+    断路器：下游持续故障时快速失败，避免每次调用都耗尽重试次数
+    
+    状态:
+        - closed: 正常放行，统计最近 window 次尝试的失败率，
+          样本数达到 min_calls 且失败率 >= failure_rate 时打开
+        - open: 直接拒绝调用（抛出 CircuitOpenError），冷却 cooldown 秒后进入半开
+        - half_open: 放行至多 probes 个探测调用，全部成功则关闭，任一失败则重新打开
+    
+    可在多个被装饰函数间共享，代表同一个下游依赖。
+    
+    参数:
+        failure_rate: 打开断路器的失败率阈值。默认: 0.5
+        window: 统计失败率的最近尝试次数。默认: 20
+        min_calls: 开始判断失败率所需的最少样本数。默认: 10
+        cooldown: 打开后到允许探测的冷却时间（秒）。默认: 30
+        probes: 半开状态下允许的探测调用数。默认: 1
+    
+    使用示例:
+    
+    >>> breaker = CircuitBreaker(failure_rate=0.5, cooldown=10)
+    >>>
+    >>> @retry(tries=3, delay=0.5, breaker=breaker)
+    >>> def query(): ...
+    >>>
+    >>> breaker.state       # 'closed' / 'open' / 'half_open'
+    >>> breaker.snapshot()  # 供监控面板使用的状态字典
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+    
+    def __init__(self, failure_rate: float = 0.5, window: int = 20, min_calls: int = 10,
+                 cooldown: float = 30, probes: int = 1):
+        if not 0 < failure_rate <= 1 or window < 1 or not 1 <= min_calls <= window or probes < 1:
+            raise ValueError(f"无效的断路器参数: failure_rate={failure_rate}, window={window}, "
+                             f"min_calls={min_calls}, probes={probes}")
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.probes = probes
+        self._outcomes = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = 0
+        self._probe_ok = 0
+        self._opened = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        """当前状态；打开且冷却结束时视为半开"""
+        if self._state == self.OPEN and self.remaining() == 0:
+            return self.HALF_OPEN
+        return self._state
+    
+    def remaining(self) -> float:
+        """距离允许探测的剩余冷却时间（秒），非打开状态为 0"""
+        if self._state != self.OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+    
+    def allow(self) -> bool:
+        """申请一次尝试，被拒绝时返回 False"""
+        with self._lock:
+            if self._state == self.OPEN:
+                if self.remaining() > 0:
+                    self._rejected += 1
+                    return False
+                self._state = self.HALF_OPEN
+                self._probing = self._probe_ok = 0
+                self._opened_at = time.monotonic()
+            if self._state == self.HALF_OPEN:
+                # 探测调用迟迟未返回结果时，冷却结束后再放行新的探测
+                if self._probing >= self.probes and time.monotonic() - self._opened_at < self.cooldown:
+                    self._rejected += 1
+                    return False
+                if self._probing >= self.probes:
+                    self._probing = self._probe_ok = 0
+                    self._opened_at = time.monotonic()
+                self._probing += 1
+            return True
+    
+    def record(self, ok: bool):
+        """记录一次尝试的结果"""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                if not ok:
+                    self._trip()
+                else:
+                    self._probe_ok += 1
+                    if self._probe_ok >= self.probes:
+                        self._state = self.CLOSED
+                        self._outcomes.clear()
+            elif self._state == self.CLOSED:
+                self._outcomes.append(ok)
+                calls = len(self._outcomes)
+                if calls >= self.min_calls and self._outcomes.count(False) / calls >= self.failure_rate:
+                    self._trip()
+            # 打开状态下到达的结果来自打开前放行的尝试，忽略
+    
+    def _trip(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._opened += 1
+        self._outcomes.clear()
+    
+    def reset(self):
+        """手动恢复到关闭状态并清空统计"""
+        with self._lock:
+            self._state = self.CLOSED
+            self._outcomes.clear()
+            self._probing = self._probe_ok = 0
+    
+    def snapshot(self) -> dict:
+        """状态快照：state、窗口内尝试数与失败率、剩余冷却时间、累计打开与拒绝次数"""
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                'state': self.state,
+                'calls': calls,
+                'failure_rate': self._outcomes.count(False) / calls if calls else 0.0,
+                'remaining': self.remaining(),
+                'opened': self._opened,
+                'rejected': self._rejected,
+            }
+    
+    def __repr__(self):
+        return f"CircuitBreaker(state={self.state!r}, failure_rate={self.failure_rate}, cooldown={self.cooldown})"
+
+
+class RetryMetrics:
+    """
+    重试指标：按调用统计尝试次数分布、执行与等待耗时、第 n 次尝试的耗时分布、最终结果与异常类型
+    
+    每次调用结束时加锁汇总一次，尝试过程中不加锁。可在多个被装饰函数间共享。
+    
+    最终结果分类:
+        - success: 不需要再重试（成功或按 logic 无需重试）
+        - exhausted: 达到最大尝试次数
+        - deadline / budget / breaker: 因总时限、重试预算、断路器放弃重试
+        - rejected: 尝试前被打开的断路器拒绝
+        - aborted: 抛出未被捕获的异常
+    
+    使用示例:
+    
+    >>> @retry(tries=3, delay=0.1, metrics=True)
+    >>> def query(): ...
+    >>>
+    >>> query.metrics.snapshot()
+    {'calls': 100, 'attempts': {1: 90, 2: 8, 3: 2}, 'mean_attempts': 1.12, ...}
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        """清空统计"""
+        with self._lock:
+            self._calls = 0
+            self._attempts = Counter()
+            self._outcomes = Counter()
+            self._exceptions = Counter()
+            self._latency = {}  # 尝试序号 → [次数, 总耗时, 最大耗时]
+            self._exec_time = 0.0
+            self._sleep_time = 0.0
+    
+    def record(self, attempts: int, outcome: str, exec_time: float, sleep_time: float, exceptions: list,
+               latencies: list = ()):
+        """汇总一次调用；latencies 为本次调用各次尝试的执行耗时，按尝试顺序"""
+        with self._lock:
+            self._calls += 1
+            self._attempts[attempts] += 1
+            self._outcomes[outcome] += 1
+            if exceptions:
+                self._exceptions.update(exceptions)
+            for n, elapsed in enumerate(latencies, 1):
+                stat = self._latency.setdefault(n, [0, 0.0, 0.0])
+                stat[0] += 1
+                stat[1] += elapsed
+                stat[2] = max(stat[2], elapsed)
+            self._exec_time += exec_time
+            self._sleep_time += sleep_time
+    
+    def snapshot(self) -> dict:
+        """
+        统计快照:
+            calls: 调用次数
+            attempts: {每次调用的尝试次数: 调用数}
+            mean_attempts: 平均尝试次数
+            outcomes: {最终结果: 调用数}
+            exceptions: {异常类型名: 出现次数}
+            latency: {尝试序号: {'count', 'mean', 'max'}}，第 n 次尝试的执行耗时分布（秒）
+            exec_time / sleep_time: 执行、退避等待的累计秒数
+            sleep_ratio: 等待时间占比
+        """
+        with self._lock:
+            total = self._exec_time + self._sleep_time
+            return {
+                'calls': self._calls,
+                'attempts': dict(sorted(self._attempts.items())),
+                'mean_attempts': sum(n * c for n, c in self._attempts.items()) / self._calls if self._calls else 0.0,
+                'outcomes': dict(self._outcomes),
+                'exceptions': dict(self._exceptions),
+                'latency': {n: {'count': c, 'mean': total / c, 'max': top}
+                            for n, (c, total, top) in sorted(self._latency.items())},
+                'exec_time': self._exec_time,
+                'sleep_time': self._sleep_time,
+                'sleep_ratio': self._sleep_time / total if total else 0.0,
+            }
+    
+    def __repr__(self):
+        return f"RetryMetrics(calls={self._calls}, outcomes={dict(self._outcomes)})"
+
+
+class _LatencyTracker:
+    """单个被装饰函数最近成功尝试的耗时样本，用于计算对冲阈值（如 p95）"""
+    def __init__(self, q: float, size: int = 100, min_samples: int = 20):
+        self.q = q
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+    
+    def add(self, elapsed: float):
+        self._samples.append(elapsed)
+    
+    def quantile(self) -> Optional[float]:
+        """样本不足时返回 None，表示暂不对冲"""
+        n = len(self._samples)
+        if n < self.min_samples:
+            return None
+        return sorted(self._samples)[min(n - 1, int(self.q * n))]
+
+
+class _DeadlineExceeded(TimeoutError):
+    """进行中的尝试超出总时限被放弃；不经过 exceptions 过滤，直接结束本次调用"""
+
+
+def _spawn(call: Callable) -> Future:
+    """
+    在新的守护线程上执行一次尝试并返回 Future
+    
+    不使用固定大小的线程池：并发调用多时尝试无需排队，被放弃的慢尝试也不会占满线程或阻塞解释器退出。
+    尝试在调用方 contextvars 上下文的副本中执行；调用方线程的 threading.local 状态在新线程上不可见
+    """
+    future = Future()
+    context = contextvars.copy_context()
+    
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = context.run(call)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+    
+    threading.Thread(target=run, name='retry-hedge', daemon=True).start()
+    return future
+
+
+def _hedged_call(call: Callable, threshold: Optional[float], timeout: Optional[float]):
+    """
+    在工作线程上执行一次尝试；超过 threshold 秒未完成时再发起一个并行尝试，取先成功者
+    
+    threshold 从主尝试实际开始执行时计时，timeout 从调用时计时。较慢的尝试被放弃，
+    两个尝试都失败时抛出后失败者的异常；超过 timeout 秒仍无结果时抛出 TimeoutError。
+    threshold 为 None 时不对冲。
+    """
+    start = time.monotonic()
+    began = []
+    
+    def first():
+        began.append(time.monotonic())
+        return call()
+    
+    pending = {_spawn(first)}
+    hedged = threshold is None
+    error = None
+    try:
+        while pending:
+            now = time.monotonic()
+            waits = []
+            if not hedged:
+                # 主尝试尚未开始时先等待一个阈值再检查
+                waits.append(threshold - (now - began[0]) if began else threshold)
+            if timeout is not None:
+                waits.append(timeout - (now - start))
+            done, pending = wait_futures(pending, timeout=max(0, min(waits)) if waits else None,
+                                         return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+            if done:
+                # 发起对冲之前主尝试已失败，交给重试流程处理
+                if not hedged:
+                    break
+                continue
+            if timeout is not None and time.monotonic() - start >= timeout:
+                raise _DeadlineExceeded(f"超出总时限 {timeout:.2f}秒，放弃未完成的尝试")
+            if hedged or not began or time.monotonic() - began[0] < threshold:
+                continue
+            pending.add(_spawn(call))
+            hedged = True
+        raise error
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+async def _ahedged_call(make: Callable, threshold: Optional[float], timeout: Optional[float]):
+    """_hedged_call 的协程版本：并行尝试为同一事件循环上的任务，较慢者被取消"""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    pending = {asyncio.ensure_future(make())}
+    hedged = threshold is None
+    error = None
+    try:
+        while pending:
+            elapsed = loop.time() - start
+            waits = [] if hedged else [threshold - elapsed]
+            if timeout is not None:
+                waits.append(timeout - elapsed)
+            done, pending = await asyncio.wait(pending, timeout=max(0, min(waits)) if waits else None,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+            if done:
+                if not hedged:
+                    break
+                continue
+            if timeout is not None and loop.time() - start >= timeout:
+                raise _DeadlineExceeded(f"超出总时限 {timeout:.2f}秒，放弃未完成的尝试")
+            pending.add(asyncio.ensure_future(make()))
+            hedged = True
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class _Timer:
+    """
+    堆驱动的定时器：单个后台线程按到期时间执行回调
+    
+    用于执行器模式下的退避等待，等待期间不占用执行器的工作线程；回调只做提交，应很快返回
+    """
+    def __init__(self):
+        self._heap = []
+        self._seq = count()
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='retry-timer', daemon=True)
+        self._thread.start()
+    
+    def schedule(self, delay: float, callback: Callable):
+        """delay 秒后在定时器线程上执行 callback"""
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), callback))
+            self._cond.notify()
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                due = self._heap[0][0]
+                now = time.monotonic()
+                if due > now:
+                    # 等待期间可能插入更早到期的回调，醒来后重新检查堆顶
+                    self._cond.wait(due - now)
+                    continue
+                _, _, callback = heapq.heappop(self._heap)
+            callback()
+
+
+_timer = None
+_timer_lock = threading.Lock()
+
+def _get_timer() -> _Timer:
+    """共享定时器，首次使用时启动"""
+    global _timer
+    if _timer is None:
+        with _timer_lock:
+            if _timer is None:
+                _timer = _Timer()
+    return _timer
+
+def _reset_after_fork():
+    # 子进程中定时器线程不存在，丢弃后按需重建
+    global _timer, _timer_lock
+    _timer = None
+    _timer_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _settle(future: Future, result=None, error: Optional[BaseException] = None):
+    """设置 future 的结果；调用方已取消时忽略"""
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+class _Adaptive:
+    """
+    单个被装饰函数的自适应退避策略（AIMD）
+    
+    - 重试速率: 尝试成功时加性增加（+0.1，至多 1），失败时乘性减小（×0.5，至少 1/max_scale），
+      延迟倍数为速率的倒数
+    - 允许的尝试次数: 按最近 window 次尝试的成功率在 [1, tries] 间缩放，下游整体故障时少重试；
+      样本不足 min_samples 个时不缩放
+    - 耗时: 快、慢两条指数移动平均之比反映下游变慢的程度，比值（至多 4）同样放大延迟
+    """
+    def __init__(self, tries: int, window: int = 50, max_scale: float = 32, min_samples: int = 10):
+        self.tries = tries
+        self.min_samples = min_samples
+        self.max_scale = max_scale
+        self.rate = 1.0
+        self._outcomes = deque(maxlen=window)
+        self._fast = self._slow = None
+        self._lock = threading.Lock()
+    
+    def record(self, ok: bool, elapsed: float):
+        """记录一次尝试的结果与耗时"""
+        with self._lock:
+            self._outcomes.append(ok)
+            if ok:
+                self.rate = min(1.0, self.rate + 0.1)
+            else:
+                self.rate = max(1 / self.max_scale, self.rate * 0.5)
+            if self._fast is None:
+                self._fast = self._slow = elapsed
+            else:
+                self._fast += 0.2 * (elapsed - self._fast)
+                self._slow += 0.01 * (elapsed - self._slow)
+    
+    @property
+    def success_rate(self) -> float:
+        """最近尝试的成功率，无样本时为 1"""
+        n = len(self._outcomes)
+        return self._outcomes.count(True) / n if n else 1.0
+    
+    def limit(self) -> int:
+        """当前允许的最大尝试次数"""
+        if len(self._outcomes) < self.min_samples:
+            return self.tries
+        return max(1, round(1 + (self.tries - 1) * self.success_rate))
+    
+    def factor(self) -> float:
+        """当前延迟倍数"""
+        slowdown = 1.0
+        if self._slow:
+            slowdown = min(4.0, max(1.0, self._fast / self._slow))
+        return min(self.max_scale, slowdown / self.rate)
+    
+    def snapshot(self) -> dict:
+        """状态快照：成功率、允许尝试次数、延迟倍数、耗时均值"""
+        return {
+            'success_rate': self.success_rate,
+            'limit': self.limit(),
+            'factor': self.factor(),
+            'latency': self._fast,
+        }
+    
+    def __repr__(self):
+        return f"_Adaptive(success_rate={self.success_rate:.2f}, limit={self.limit()}, factor={self.factor():.2f})"
+
+
+class _Batch:
+    """批量模式下一次调用的逐项状态：记录每项结果，只保留仍失败的项用于下次尝试"""
+    def __init__(self, items):
+        self.items = list(items)
+        self.results = [None] * len(self.items)
+        self.pending = list(range(len(self.items)))
+        self.final = []  # 异常不在 exceptions 中、不再重试的失败项
+    
+    def subset(self) -> list:
+        """仍需尝试的项，保持原顺序"""
+        return [self.items[i] for i in self.pending]
+    
+    def merge(self, outcomes, check_func, exceptions=Exception):
+        """
+        合并一次尝试的逐项结果：属于 exceptions 的异常实例或未通过 check_func 的值视为失败、待重试；
+        其他异常实例是该项的最终结果，不再重试
+        """
+        outcomes = list(outcomes)
+        if len(outcomes) != len(self.pending):
+            raise ValueError(f"split 返回 {len(outcomes)} 项结果，本次批次为 {len(self.pending)} 项")
+        failed = []
+        for i, out in zip(self.pending, outcomes):
+            self.results[i] = out
+            if isinstance(out, BaseException) and not isinstance(out, exceptions):
+                self.final.append(i)
+            elif isinstance(out, BaseException) or (check_func is not None and not check_func(out)):
+                failed.append(i)
+        self.pending = failed
+    
+    def fail_all(self, e: BaseException):
+        """整批调用失败时，所有待尝试项都记为该异常"""
+        for i in self.pending:
+            self.results[i] = e
+    
+    def progressed(self) -> bool:
+        """是否已有项得到最终结果（成功或不再重试的失败）"""
+        return len(self.pending) < len(self.items)
+    
+    def outcome(self) -> list:
+        failed = sorted(self.pending + self.final)
+        if failed:
+            raise PartialBatchError(self.results, failed)
+        return self.results
+
+
+class _SplitError(Exception):
+    """批量模式下 split 或合并逐项结果出错：属于调用方的问题，不重试，由外层抛出原异常"""
+    def __init__(self, error: Exception):
+        super().__init__(error)
+        self.error = error
+
+
+class _RetryState:
+    """
+    一次调用的重试状态：记录每次尝试的结果，按 check_func 与 logic 决定是否重试以及等待时间
+    
+    同步、协程两种执行方式共用，只负责判断，不负责执行与等待
+    """
+    def __init__(self, tries, delay, backoff, check_func, logic, log,
+                 jitter=None, max_delay=None, budget=None, breaker=None, deadline=None, adaptive=None,
+                 metrics=None):
+        self.tries = tries
+        self.delay = delay
+        self.backoff = backoff
+        self.check_func = check_func
+        self.logic = logic
+        self.log = log
+        self.jitter = jitter
+        self.max_delay = max_delay
+        self.budget = budget
+        self.breaker = breaker
+        self.deadline_at = None if deadline is None else time.monotonic() + deadline
+        self.adaptive = adaptive
+        self.metrics = metrics
+        self.timed = adaptive is not None or metrics is not None
+        self.started = 0.0
+        self.exec_time = 0.0
+        self.sleep_time = 0.0
+        self.errors = []
+        self.latencies = []
+        self.attempt = 1
+        self.current_delay = delay
+        self.last_wait = delay
+        self.last_exception = None
+        self.last_result = None
+    
+    def admit(self):
+        """尝试前检查断路器，打开时直接抛出 CircuitOpenError"""
+        if self.breaker is not None and not self.breaker.allow():
+            self._finish('rejected', self.attempt - 1)
+            raise CircuitOpenError(f"断路器已打开，{self.breaker.remaining():.2f}秒后允许探测调用")
+        if self.timed:
+            self.started = time.perf_counter()
+    
+    def remaining(self) -> Optional[float]:
+        """距离总时限的剩余秒数，未设置总时限时返回 None"""
+        if self.deadline_at is None:
+            return None
+        return max(0.0, self.deadline_at - time.monotonic())
+    
+    def aborted(self, failure: bool = True):
+        """记录一次未被捕获的异常；failure 为 False 时下游调用本身已成功，不计入断路器"""
+        if self.breaker is not None and failure:
+            self.breaker.record(False)
+        if self.metrics is not None:
+            self._elapsed()
+            self._finish('aborted')
+    
+    def expired(self):
+        """进行中的尝试超出总时限，不计入断路器，本次调用按 deadline 结束"""
+        if self.timed:
+            self._elapsed()
+        self._finish('deadline')
+    
+    def check(self, result) -> bool:
+        """记录返回值，返回是否因返回值检查失败需要重试"""
+        self.last_result = result
+        # 检查函数返回False表示需要重试
+        return self.check_func is not None and not self.check_func(result)
+    
+    def failed(self, e: Exception) -> bool:
+        """记录异常，返回是否因异常需要重试"""
+        self.last_exception = e
+        if self.metrics is not None:
+            self.errors.append(type(e).__name__)
+        return True
+    
+    def next_delay(self, retry_by_exception: bool, retry_by_result: bool) -> Optional[float]:
+        """返回下次重试前的等待秒数；不再重试时返回 None"""
+        # 根据逻辑条件判断是否重试
+        if self.logic == 'or':
+            should_retry = retry_by_exception or retry_by_result
+        elif self.logic == 'and':
+            should_retry = retry_by_exception and retry_by_result
+        else:  # 'xor'
+            should_retry = retry_by_exception != retry_by_result
+        
+        self.should_retry = should_retry
+        if self.breaker is not None:
+            self.breaker.record(not should_retry)
+        if self.timed:
+            elapsed = self._elapsed()
+            if self.adaptive is not None:
+                self.adaptive.record(not should_retry, elapsed)
+        # 如果不需要重试，或达到最大尝试次数，不再重试
+        if not should_retry:
+            if self.budget is not None:
+                self.budget.deposit()
+            return self._finish('success')
+        limit = self.tries if self.adaptive is None else self.adaptive.limit()
+        if self.attempt >= limit:
+            return self._finish('exhausted')
+        
+        # 记录重试信息
+        retry_reason = []
+        if retry_by_exception:
+            retry_reason.append(f"异常: {type(self.last_exception).__name__}")
+        if retry_by_result:
+            retry_reason.append("返回值检查失败")
+        
+        # 断路器已打开，不再等待重试
+        if self.breaker is not None and self.breaker.state == CircuitBreaker.OPEN:
+            self.log(f"尝试 {self.attempt}/{self.tries} 失败（{'，'.join(retry_reason)}），断路器已打开，不再重试")
+            return self._finish('breaker')
+        
+        wait = self._wait()
+        # 等待后将超出总时限，放弃重试
+        if self.deadline_at is not None and time.monotonic() + wait >= self.deadline_at:
+            self.log(f"尝试 {self.attempt}/{self.tries} 失败（{'，'.join(retry_reason)}），剩余时间不足，不再重试")
+            return self._finish('deadline')
+        
+        # 重试预算耗尽，放弃重试
+        if self.budget is not None and not self.budget.withdraw():
+            self.log(f"尝试 {self.attempt}/{self.tries} 失败（{'，'.join(retry_reason)}），重试预算耗尽，不再重试")
+            return self._finish('budget')
+        
+        self.log(f"尝试 {self.attempt}/{self.tries} 失败（{'，'.join(retry_reason)}），{wait:.2f}秒后重试...")
+        self.attempt += 1
+        self.sleep_time += wait
+        return wait
+    
+    def _elapsed(self) -> float:
+        """本次尝试的执行耗时，计入累计执行时间与逐次耗时"""
+        elapsed = time.perf_counter() - self.started
+        self.exec_time += elapsed
+        if self.metrics is not None:
+            self.latencies.append(elapsed)
+        return elapsed
+    
+    def _finish(self, outcome: str, attempts: Optional[int] = None) -> None:
+        """调用结束，向指标汇总本次调用"""
+        if self.metrics is not None:
+            self.metrics.record(self.attempt if attempts is None else attempts, outcome,
+                                self.exec_time, self.sleep_time, self.errors, self.latencies)
+        return None
+    
+    def _wait(self) -> float:
+        """按抖动策略计算本次等待时间，并推进下次延迟"""
+        if self.jitter == 'full':
+            # 全抖动：[0, 指数延迟] 内均匀取值
+            wait = random.uniform(0, self.current_delay)
+        elif self.jitter == 'decorrelated':
+            # 去相关抖动：[初始延迟, 上次等待 * 3] 内均匀取值
+            wait = random.uniform(self.delay, self.last_wait * 3)
+        else:
+            wait = self.current_delay
+        if self.adaptive is not None:
+            wait *= self.adaptive.factor()
+        if self.max_delay is not None:
+            wait = min(wait, self.max_delay)
+        self.last_wait = wait
+        self.current_delay *= self.backoff
+        return wait
+    
+    def outcome(self, result):
+        """不再重试时的最终结果：不需要重试则返回本次结果，否则抛出最后一次异常或返回最后一次结果"""
+        if not self.should_retry:
+            return result
+        if self.last_exception is not None:
+            raise self.last_exception
+        return self.last_result
 
-__all__ = ["retry"]
 
 def retry(
     tries: int = 3,
@@ -12,7 +789,17 @@ def retry(
     exceptions: Union[Type[Exception], Tuple[Type[Exception], ...]] = Exception,
     check_func: Optional[Callable[[Any], bool]] = None,
     logic: str = 'or',
-    logger: Optional[logging.Logger] = None
+    logger: Optional[logging.Logger] = None,
+    jitter: Optional[str] = None,
+    max_delay: Optional[float] = None,
+    budget: Optional[RetryBudget] = None,
+    breaker: Optional[CircuitBreaker] = None,
+    deadline: Optional[float] = None,
+    hedge: Union[None, float, str] = None,
+    executor: Optional[Executor] = None,
+    adaptive: bool = False,
+    split: Optional[Callable[[list, Any], list]] = None,
+    metrics: Union[bool, RetryMetrics] = False
 ) -> Callable:
     """
     增强版重试装饰器，支持多种重试条件和灵活的重试逻辑。
@@ -20,7 +807,7 @@ def retry(
     该装饰器会在函数执行失败或返回值不满足条件时自动重试，支持多种重试逻辑组合。
     
     参数:
-        tries: 最大重试次数（包括首次执行）。默认: 3
+        tries: 最大重试次数（包括首次执行），至少为 1。默认: 3
         delay: 初始延迟时间（秒）。默认: 1
         backoff: 延迟时间倍增因子。每次重试延迟 = 延迟 * backoff。默认: 2
         exceptions: 需要捕获并重试的异常类型或元组。默认: 所有异常
@@ -31,6 +818,37 @@ def retry(
             - 'xor': 仅满足异常或返回值检查中的一个条件时重试
             默认: 'or'
         logger: 日志记录器实例。默认: 使用内置的print函数
+        jitter: 延迟抖动策略，避免大量客户端同步重试，支持以下值:
+            - None: 不抖动，严格按 delay * backoff^n 等待
+            - 'full': 在 [0, delay * backoff^n] 内随机等待
+            - 'decorrelated': 在 [delay, 上次等待 * 3] 内随机等待
+            默认: None
+        max_delay: 单次等待时间上限（秒）。默认: None，不限制
+        budget: 重试预算（RetryBudget），可在多个函数间共享，令牌耗尽时不再重试。默认: None
+        breaker: 断路器（CircuitBreaker），记录每次尝试结果，打开时调用直接抛出 CircuitOpenError。默认: None
+        deadline: 所有尝试（含等待）的总时限（秒），剩余时间不足以等待下次重试时不再重试。默认: None
+        hedge: 对冲阈值，尝试超过该耗时仍未完成时在工作线程上并行发起同样的尝试，取先成功者:
+            - None: 不对冲
+            - 数值: 固定阈值（秒）
+            - 'p95' / 'p99' 等: 该函数最近成功尝试耗时的分位数，样本不足 20 个时不对冲
+            默认: None
+        executor: 执行器（如 ThreadPoolExecutor）。指定后被装饰函数立即返回 Future，
+            每次尝试提交到该执行器执行，退避等待由共享定时器线程负责，到期后再次提交，
+            等待期间不占用执行器的工作线程。仅支持同步函数；尝试无法 pickle，
+            不能用于进程池（返回的 Future 以序列化异常结束）。默认: None
+        adaptive: 是否按该函数最近的成功率与耗时自适应调整（AIMD）:
+            失败时重试速率减半、成功时加 0.1，延迟按速率的倒数放大，下游变慢时延迟进一步放大，
+            允许的尝试次数按成功率在 [1, tries] 间缩放。
+            状态可通过被装饰函数的 adaptive 属性查看。默认: False
+        split: 批量模式的结果拆分函数 split(批次, 返回值) -> 与批次等长的逐项结果。
+            指定后被装饰函数的第一个位置参数为批次（项的序列），逐项结果中属于 exceptions 的异常实例
+            或未通过 check_func 的值视为该项失败，只有失败项组成新批次重试；其他异常实例
+            是该项的最终结果，不再重试；
+            最终按原顺序返回逐项结果列表，重试用尽仍有失败项时抛出 PartialBatchError；
+            split 本身抛出异常或返回长度不符时不重试，直接抛出该异常。
+            不能与 hedge、executor 同时使用。默认: None
+        metrics: 是否收集重试指标。True 时每个被装饰函数单独统计，也可传入 RetryMetrics
+            实例在多个函数间共享；通过被装饰函数的 metrics 属性查询。默认: False
     
     返回:
         装饰器函数
@@ -40,6 +858,17 @@ def retry(
         2. 当check_func为None时，仅依赖异常决定是否重试
         3. XOR逻辑下，异常和返回值检查只有一个条件满足时重试
         4. 当达到最大重试次数后，会抛出最后一次异常或返回最后一次结果
+        5. 重试预算耗尽时按已达最大次数处理：抛出最后一次异常或返回最后一次结果
+        6. 重试过程中断路器打开时立即停止重试，抛出最后一次异常或返回最后一次结果
+        7. 同步函数未启用对冲时，总时限只在尝试之间检查，无法打断进行中的尝试；
+           启用对冲后（以及协程函数），尝试超出总时限会被放弃并直接抛出 TimeoutError，
+           不受 exceptions 过滤、不计入断路器，指标记为 deadline
+        8. 对冲会让同一次尝试执行两次，只应用于幂等的函数；同步函数启用对冲后每次尝试都在新线程上执行，
+           contextvars 会复制过去，但调用方线程的 threading.local 状态（如 trd.state）不可用，
+           需要时在函数内读取或改用 contextvars
+        9. 执行器模式下取消返回的 Future 会停止后续重试
+        10. 批量模式下 check_func 逐项检查，logic 固定为 'or'；整批调用抛出异常时当前批次全部重试
+        11. 装饰 async def 函数时，装饰后仍是协程函数，重试间隔用 asyncio.sleep 等待，不阻塞事件循环
     
     使用示例:
     
@@ -81,7 +910,18 @@ def retry(
     >>>     return num
     >>>
     >>> print("特殊案例结果:", special_case())
+    
+    >>> # 协程函数重试
+    >>> @retry(tries=3, delay=0.5, exceptions=ConnectionError)
+    >>> async def fetch():
+    >>>     ...
+    >>>
+    >>> result = await fetch()
     """
+    # 验证重试次数
+    if tries < 1:
+        raise ValueError(f"无效的重试次数: {tries}. 至少为 1（仅执行一次）")
+    
     # 验证逻辑参数有效性
     valid_logics = {'or', '|', '||', 'and', '&', '&&', 'xor', '^'}
     if logic not in valid_logics:
@@ -92,79 +932,265 @@ def retry(
             'and' if logic in {'&', '&&'} else \
             'xor' if logic in {'^'} else logic
     
+    # 验证抖动策略有效性
+    valid_jitters = {None, 'full', 'decorrelated'}
+    if jitter not in valid_jitters:
+        raise ValueError(f"无效的抖动策略: {jitter}. 有效值: {valid_jitters}")
+    
+    # 验证对冲阈值有效性
+    if isinstance(hedge, str):
+        if not (hedge[:1] == 'p' and hedge[1:].isdigit() and 0 < int(hedge[1:]) < 100):
+            raise ValueError(f"无效的对冲阈值: {hedge}. 有效值: 正数秒数或 'p95' 等分位数")
+        hedge_q = int(hedge[1:]) / 100
+    elif hedge is not None and hedge <= 0:
+        raise ValueError(f"无效的对冲阈值: {hedge}. 有效值: 正数秒数或 'p95' 等分位数")
+    
+    # 验证执行器模式
+    if executor is not None and not isinstance(executor, Executor):
+        raise TypeError(f"executor 需要是 concurrent.futures.Executor 实例，而不是 {type(executor).__name__}")
+    
+    # 验证批量模式
+    if split is not None and (hedge is not None or executor is not None):
+        raise ValueError("批量模式（split）不能与 hedge、executor 同时使用")
+    
     # 设置日志记录器
     log = logger.info if logger else print
     
+    def new_state(policy: Optional[_Adaptive], stats: Optional[RetryMetrics],
+                  check=check_func, how=logic) -> _RetryState:
+        return _RetryState(tries, delay, backoff, check, how, log,
+                           jitter, max_delay, budget, breaker, deadline, policy, stats)
+    
     def decorator(func: Callable) -> Callable:
+        # 自适应状态与指标（未共享时）按被装饰函数单独维护
+        policy = _Adaptive(tries) if adaptive else None
+        stats = metrics if isinstance(metrics, RetryMetrics) else RetryMetrics() if metrics else None
+        if split is None:
+            wrapper = _decorate(func, partial(new_state, policy, stats))
+        else:
+            wrapper = _batch_decorator(func, policy, stats)
+        wrapper.adaptive = policy
+        wrapper.metrics = stats
+        return wrapper
+    
+    def _batch_decorator(func: Callable, policy: Optional[_Adaptive], stats: Optional[RetryMetrics]) -> Callable:
+        # 批量模式：每次尝试只提交仍失败的项，逐项结果按原顺序合并；没有待尝试项即成功
+        start = partial(new_state, policy, stats, lambda batch: not batch.pending, 'or')
+        
+        def merge(batch: _Batch, subset: list, result):
+            try:
+                batch.merge(split(subset, result), check_func, exceptions)
+            except Exception as e:
+                raise _SplitError(e) from e
+        
+        def finish(batch: _Batch, e: Exception):
+            # split 出错时直接抛出；已有项成功时保留部分结果，否则抛出原异常
+            if isinstance(e, _SplitError):
+                raise e.error from e.error.__cause__
+            if batch.progressed():
+                raise PartialBatchError(batch.results, sorted(batch.pending + batch.final)) from e
+            raise e
+        
+        if inspect.iscoroutinefunction(func):
+            async def run(batch, *args, **kwargs):
+                subset = batch.subset()
+                try:
+                    result = await func(subset, *args, **kwargs)
+                except Exception as e:
+                    batch.fail_all(e)
+                    raise
+                merge(batch, subset, result)
+                return batch
+            
+            inner = _decorate(run, start)
+            
+            @wraps(func)
+            async def wrapper(items, *args, **kwargs) -> list:
+                batch = _Batch(items)
+                if batch.pending:
+                    try:
+                        await inner(batch, *args, **kwargs)
+                    except Exception as e:
+                        finish(batch, e)
+                return batch.outcome()
+            
+            return wrapper
+        
+        def run(batch, *args, **kwargs):
+            subset = batch.subset()
+            try:
+                result = func(subset, *args, **kwargs)
+            except Exception as e:
+                batch.fail_all(e)
+                raise
+            merge(batch, subset, result)
+            return batch
+        
+        inner = _decorate(run, start)
+        
         @wraps(func)
-        def wrapper(*args, **kwargs) -> Any:
-            nonlocal delay
-            current_delay = delay
-            last_exception = None
-            last_result = None
-            attempt = 1
+        def wrapper(items, *args, **kwargs) -> list:
+            batch = _Batch(items)
+            if batch.pending:
+                try:
+                    inner(batch, *args, **kwargs)
+                except Exception as e:
+                    finish(batch, e)
+            return batch.outcome()
+        
+        return wrapper
+    
+    def _decorate(func: Callable, new_state: Callable[[], _RetryState]) -> Callable:
+        # 按分位数对冲时，每个被装饰函数单独统计耗时
+        tracker = _LatencyTracker(hedge_q) if isinstance(hedge, str) else None
+        
+        def hedge_after() -> Optional[float]:
+            return hedge if tracker is None else tracker.quantile()
+        
+        if inspect.iscoroutinefunction(func):
+            if executor is not None:
+                raise TypeError("执行器模式仅支持同步函数")
+            return _async_decorator(func, new_state, tracker, hedge_after)
+        
+        def call_once(*args, **kwargs):
+            if tracker is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            tracker.add(time.perf_counter() - start)
+            return result
+        
+        def attempt(state: _RetryState, args, kwargs):
+            """执行一次尝试，返回 (本次结果, 下次重试前的等待秒数；不再重试时为 None)"""
+            state.admit()
+            result = None
+            retry_by_result = False
             
-            while attempt <= tries:
+            try:
+                # 执行目标函数，超过对冲阈值时在工作线程上并行尝试
+                threshold = hedge_after()
+                if threshold is None:
+                    result = call_once(*args, **kwargs)
+                else:
+                    result = _hedged_call(partial(call_once, *args, **kwargs), threshold, state.remaining())
                 retry_by_exception = False
-                retry_by_result = False
+                # 检查返回值条件
+                retry_by_result = state.check(result)
+                
+            except _DeadlineExceeded:
+                state.expired()
+                raise
+            except _SplitError:
+                state.aborted(failure=False)
+                raise
+            except Exception as e:
+                # 检查异常类型是否在捕获范围内
+                if not isinstance(e, exceptions):
+                    state.aborted()
+                    raise
+                retry_by_exception = state.failed(e)
+            
+            return result, state.next_delay(retry_by_exception, retry_by_result)
+        
+        if executor is not None:
+            return _executor_decorator(func, new_state, attempt)
+        
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            state = new_state()
+            
+            while True:
+                result, wait = attempt(state, args, kwargs)
+                if wait is None:
+                    return state.outcome(result)
+                
+                # 等待后重试
+                time.sleep(wait)
+        
+        return wrapper
+    
+    def _executor_decorator(func: Callable, new_state, attempt) -> Callable:
+        # 执行器模式：尝试在执行器上运行，退避交给定时器，调用方拿到 Future
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> Future:
+            future = Future()
+            state = new_state()
+            
+            def step():
+                if future.cancelled():
+                    return
+                try:
+                    result, wait = attempt(state, args, kwargs)
+                    if wait is None:
+                        _settle(future, state.outcome(result))
+                    else:
+                        _get_timer().schedule(wait, resubmit)
+                except BaseException as e:
+                    _settle(future, error=e)
+            
+            def forward(inner: Future):
+                # 提交成功后执行器仍可能失败（如进程池无法 pickle step）或取消任务，转交给调用方
+                if inner.cancelled():
+                    future.cancel()
+                elif inner.exception() is not None:
+                    _settle(future, error=inner.exception())
+            
+            def resubmit():
+                try:
+                    executor.submit(step).add_done_callback(forward)
+                except Exception as e:  # 执行器已关闭
+                    _settle(future, error=e)
+            
+            resubmit()
+            return future
+        
+        return wrapper
+    
+    def _async_decorator(func: Callable, new_state, tracker, hedge_after) -> Callable:
+        # 协程函数：await 每次尝试，用 asyncio.sleep 退避，不阻塞事件循环
+        async def call_once(*args, **kwargs):
+            if tracker is None:
+                return await func(*args, **kwargs)
+            start = time.perf_counter()
+            result = await func(*args, **kwargs)
+            tracker.add(time.perf_counter() - start)
+            return result
+        
+        @wraps(func)
+        async def wrapper(*args, **kwargs) -> Any:
+            state = new_state()
+            
+            while True:
+                state.admit()
                 result = None
+                retry_by_result = False
                 
                 try:
-                    # 执行目标函数
-                    result = func(*args, **kwargs)
-                    last_result = result
-                    
-                    # 检查返回值条件
-                    if check_func is not None:
-                        # 检查函数返回False表示需要重试
-                        retry_by_result = not check_func(result)
+                    threshold = hedge_after()
+                    if threshold is None and state.deadline_at is None:
+                        result = await call_once(*args, **kwargs)
+                    else:
+                        result = await _ahedged_call(partial(call_once, *args, **kwargs), threshold, state.remaining())
+                    retry_by_exception = False
+                    retry_by_result = state.check(result)
                     
+                except _DeadlineExceeded:
+                    state.expired()
+                    raise
+                except _SplitError:
+                    state.aborted(failure=False)
+                    raise
                 except Exception as e:
-                    # 检查异常类型是否在捕获范围内
                     if not isinstance(e, exceptions):
+                        state.aborted()
                         raise
-                    
-                    last_exception = e
-                    retry_by_exception = True
-                    
-                    # 异常情况下返回值条件不满足
-                    if check_func is not None:
-                        retry_by_result = False
-                
-                # 根据逻辑条件判断是否重试
-                if logic == 'or':
-                    should_retry = retry_by_exception or retry_by_result
-                elif logic == 'and':
-                    should_retry = retry_by_exception and retry_by_result
-                else:  # 'xor'
-                    should_retry = retry_by_exception != retry_by_result
-                
-                # 如果不需要重试，直接返回结果
-                if not should_retry:
-                    return result
-                
-                # 如果达到最大尝试次数，不再重试
-                if attempt == tries:
-                    break
+                    retry_by_exception = state.failed(e)
                 
-                # 记录重试信息
-                retry_reason = []
-                if retry_by_exception:
-                    retry_reason.append(f"异常: {type(last_exception).__name__}")
-                if retry_by_result:
-                    retry_reason.append("返回值检查失败")
+                wait = state.next_delay(retry_by_exception, retry_by_result)
+                if wait is None:
+                    return state.outcome(result)
                 
-                log(f"尝试 {attempt}/{tries} 失败（{'，'.join(retry_reason)}），{current_delay:.2f}秒后重试...")
-                
-                # 等待并计算下次延迟时间
-                time.sleep(current_delay)
-                current_delay *= backoff
-                attempt += 1
-            
-            # 处理最终结果
-            if last_exception is not None:
-                raise last_exception
-            return last_result
+                await asyncio.sleep(wait)
         
         return wrapper
     
@@ -280,4 +1306,141 @@ if __name__ == '__main__':
     
     print("无重试条件:", no_retry_needed())
     
+    # 测试7: 协程函数重试
+    print("\n=== 测试7: 协程函数重试 ===")
+    import asyncio
+    
+    @retry(tries=4, delay=0.2, exceptions=ConnectionError, logger=logger)
+    async def async_request():
+        import random
+        await asyncio.sleep(0.05)
+        if random.random() < 0.6:
+            raise ConnectionError("网络连接失败")
+        return "异步请求成功"
+    
+    async def main():
+        # 多个调用并发执行，退避期间事件循环不被阻塞
+        return await asyncio.gather(*(async_request() for _ in range(3)), return_exceptions=True)
+    
+    print("协程结果:", asyncio.run(main()))
+    
+    # 测试8: 抖动与共享重试预算
+    print("\n=== 测试8: 抖动与共享重试预算 ===")
+    shared_budget = RetryBudget(ratio=0.5, capacity=2)
+    
+    @retry(tries=5, delay=0.1, jitter='full', budget=shared_budget, logger=logger)
+    def always_down():
+        raise ConnectionError("服务不可用")
+    
+    for i in range(3):
+        try:
+            always_down()
+        except ConnectionError:
+            print(f"第{i + 1}次调用失败，剩余预算: {shared_budget}")
+    
+    # 测试9: 断路器
+    print("\n=== 测试9: 断路器 ===")
+    breaker = CircuitBreaker(failure_rate=0.5, window=4, min_calls=4, cooldown=0.5)
+    healthy = [False]
+    
+    @retry(tries=3, delay=0.05, exceptions=ConnectionError, breaker=breaker, logger=logger)
+    def dependency():
+        if not healthy[0]:
+            raise ConnectionError("依赖不可用")
+        return "依赖恢复"
+    
+    for i in range(4):
+        try:
+            dependency()
+        except (ConnectionError, CircuitOpenError) as e:
+            print(f"第{i + 1}次调用: {type(e).__name__}，断路器: {breaker.snapshot()}")
+    
+    healthy[0] = True
+    time.sleep(0.5)
+    print("冷却后探测:", dependency(), breaker.state)
+    
+    # 测试10: 总时限与对冲请求
+    print("\n=== 测试10: 总时限与对冲请求 ===")
+    
+    @retry(tries=3, delay=0.1, hedge=0.05, deadline=1, logger=logger)
+    def slow_tail():
+        import random
+        # 偶尔出现的慢尝试由对冲尝试兜底
+        time.sleep(0.5 if random.random() < 0.3 else 0.01)
+        return "完成"
+    
+    start = time.perf_counter()
+    results = [slow_tail() for _ in range(10)]
+    print(f"10次调用耗时: {time.perf_counter() - start:.2f}秒", results[0])
+    
+    # 测试11: 执行器模式，退避期间不占用工作线程
+    print("\n=== 测试11: 执行器模式 ===")
+    pool = ThreadPoolExecutor(max_workers=2)
+    
+    @retry(tries=3, delay=0.3, executor=pool, logger=logger)
+    def flaky(i):
+        import random
+        time.sleep(0.01)
+        if random.random() < 0.5:
+            raise ConnectionError(f"任务{i}失败")
+        return i
+    
+    start = time.perf_counter()
+    futures = [flaky(i) for i in range(8)]
+    print("执行器结果:", [f.exception() or f.result() for f in futures],
+          f"耗时: {time.perf_counter() - start:.2f}秒")
+    pool.shutdown()
+    
+    # 测试12: 自适应退避
+    print("\n=== 测试12: 自适应退避 ===")
+    
+    @retry(tries=4, delay=0.01, adaptive=True, logger=logger)
+    def degraded():
+        import random
+        if random.random() < 0.7:
+            raise ConnectionError("下游降级")
+        return "成功"
+    
+    for i in range(5):
+        try:
+            degraded()
+        except ConnectionError:
+            pass
+        print(f"第{i + 1}次调用后: {degraded.adaptive.snapshot()}")
+    
+    # 测试13: 批量部分重试
+    print("\n=== 测试13: 批量部分重试 ===")
+    
+    def per_item(batch, result):
+        # 接口返回 {项: 结果或错误}，按批次顺序拆成逐项结果
+        return [result[x] for x in batch]
+    
+    @retry(tries=4, delay=0.05, split=per_item, logger=logger)
+    def bulk_lookup(keys):
+        import random
+        print(f"  提交批次: {keys}")
+        return {k: k * 10 if random.random() < 0.6 else TimeoutError(f"{k}超时") for k in keys}
+    
+    try:
+        print("批量结果:", bulk_lookup([1, 2, 3, 4, 5, 6]))
+    except PartialBatchError as e:
+        print("部分失败:", e, e.results)
+    
+    # 测试14: 重试指标
+    print("\n=== 测试14: 重试指标 ===")
+    
+    @retry(tries=3, delay=0.01, metrics=True, logger=logger)
+    def measured():
+        import random
+        if random.random() < 0.4:
+            raise random.choice([ConnectionError, TimeoutError])("失败")
+        return "成功"
+    
+    for _ in range(20):
+        try:
+            measured()
+        except (ConnectionError, TimeoutError):
+            pass
+    print("指标:", measured.metrics.snapshot())
+    
     print("\n所有测试完成!")
\ No newline at end of file
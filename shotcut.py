@@ -67,22 +67,53 @@ def apply(f,args,kwargs):
 def _random_name(n=14):
     return ''.join(random.choice(string.ascii_lowercase) for _ in range(n))
 
-def fmap(f,sfmt):
+class _Names(dict):
+    # 把 %(name)s 原样还原成名字，用于生成源码
+    def __missing__(self, key):
+        return key
+
+_compiled = {}  # (源码, env指纹) → 编译好的函数
+_COMPILED_MAX = 4096
+
+def _compile(src, env, arity):
+    """把整条表达式编译成一个函数：_ 依次替换为 x1..xn，%(name)s 引用 env 中的对象"""
+    key = (src, tuple((k, id(v)) for k, v in env.items()))
+    func = _compiled.get(key)
+    if func is None:
+        names = iter(map("x{}".format, count(1)))
+        body = re.sub(r"(?<!\w)_(?!\w)", lambda m: next(names), src) % _Names()
+        args = ','.join("x%d" % i for i in range(1, arity + 1))
+        # 复制 env 作为 globals，函数持有其中的对象，id 不会被复用
+        func = eval("lambda %s: %s" % (args, body), dict(env))
+        if len(_compiled) >= _COMPILED_MAX:
+            del _compiled[next(iter(_compiled))]
+        _compiled[key] = func
+    return func
+
+def _template(ssrc, **parts):
+    return re.sub(r"\b(self|other)\b", lambda m: parts[m.group(1)], ssrc.replace('%', '%%'))
+
+def fmap(f,sfmt,ssrc=None):
+    ssrc = ssrc or sfmt
     def applyier(self,other):
         fmt = "(%s)" % sfmt.replace("self",self._fmt)
         cls = self.__class__
+        self_src,self_env = self._source()
         if isinstance(other,cls):
+            other_src,other_env = other._source()
             return cls((f,self,other),
                        fmt.replace("other",other._fmt),
-                       dict(list(self._fmt_args.items()) + list(other._fmt_args.items())),
-                       self._arity + other._arity)
+                       dict(list(self._fmt_args.items()) + list(other._fmt_args.items()) + self_env + other_env),
+                       self._arity + other._arity,
+                       "(%s)" % _template(ssrc,self=self_src,other=other_src))
         else:
             call = F(flip(f),other) << F(self)
             name = _random_name()
             return cls(call,
                        fmt.replace("other","%%(%s)r" % name),
-                       dict(list(self._fmt_args.items()) + [(name,other)]),
-                       self._arity)
+                       dict(list(self._fmt_args.items()) + [(name,other)] + self_env),
+                       self._arity,
+                       "(%s)" % _template(ssrc,self=self_src,other="%%(%s)s" % name))
     return applyier
 
 class ArityError(TypeError):
@@ -93,45 +124,71 @@ def unary_fmap(f,sfmt):
     def applyier(self):
         fmt = "(%s)" % sfmt.replace("self",self._fmt)
         cls = self.__class__
-        return cls(F(self) << f,fmt,self._fmt_args,self._arity)
+        self_src,self_env = self._source()
+        return cls(F(self) << f,fmt,dict(list(self._fmt_args.items()) + self_env),self._arity,
+                   "(%s)" % _template(sfmt,self=self_src))
     return applyier
 
 
 
 
 class _ShotCut:
-    __slots__ = ('_call', '_fmt', '_fmt_args', '_arity')
+    __slots__ = ('_call', '_fmt', '_fmt_args', '_arity', '_src', '_func')
     __flipback__ = None
-    def __init__(self,call = _identify,fmt = '_',fmt_args = None,arity=1):
+    def __init__(self,call = _identify,fmt = '_',fmt_args = None,arity=1,src=None):
         self._call = call
         self._fmt = fmt
         self._fmt_args = fmt_args or {}
         self._arity = arity
+        # 生成源码，_ 为参数占位符，%(name)s 引用 _fmt_args 中的对象；None 表示只能通过 _call 调用
+        self._src = '_' if src is None and call is _identify and fmt == '_' else src
+        self._func = None
+    
+    def _source(self):
+        """返回 (源码片段, 额外的 env 项)，无源码时把自身作为一次调用嵌入"""
+        if self._src is not None:
+            return self._src,[]
+        name = _random_name()
+        return "%%(%s)s(%s)" % (name,','.join('_' * self._arity)),[(name,self)]
+    
+    @property
+    def compiled(self):
+        # 整条表达式编译成一个函数，调用开销与表达式长度无关
+        if self._func is None:
+            self._func = _compile(self._src,self._fmt_args,self._arity)
+        return self._func
     
     def call(self,name,*args,**kwargs):
         return self.__class__(F(lambda f:apply(f,args,kwargs) << operator.attrgetter(name) << F(self)))
     
     def __getattr__(self,name):
         attr_name =_random_name()
+        self_src,self_env = self._source()
         return self.__class__(F(operator.attrgetter(name)) << F(self),
                               "getattr(%s,%%(%s)r)" % (self._fmt,attr_name),
-                              dict(list(self._fmt_args.items()) + [(attr_name,name)]),
-                              self._arity)
+                              dict(list(self._fmt_args.items()) + [(attr_name,name)] + self_env),
+                              self._arity,
+                              "getattr(%s,%%(%s)s)" % (self_src,attr_name))
     __expr__  = expr = hd.__expr__
     __lazy__ = lazy = staticmethod(hd.__lazy__)
     def __getitem__(self,key):
+        self_src,self_env = self._source()
         if isinstance(key,self.__class__):
+            key_src,key_env = key._source()
             return self.__class__((operator.getitem,self,key),
                                   "%s[%s]" % (self._fmt,key._fmt),
-                                  dict(list(self._fmt_args.items()) + list(key._fmt_args.items())),
-                                  self._arity + key._arity)
+                                  dict(list(self._fmt_args.items()) + list(key._fmt_args.items()) + self_env + key_env),
+                                  self._arity + key._arity,
+                                  "%s[%s]" % (self_src,key_src))
         # if isinstance(key,tuple):
         f = hd[key]
         item_name = _random_name()
+        func_name = _random_name()
         return self.__class__(F(f) << F(self),
                               "%s[%%(%s)r]" % (self._fmt,item_name),
-                              dict(list(self._fmt_args.items()) + [(item_name,key)]),
-                              self._arity)
+                              dict(list(self._fmt_args.items()) + [(item_name,key),(func_name,f)] + self_env),
+                              self._arity,
+                              "%%(%s)s(%s)" % (func_name,self_src))
     def __str__(self):
         args = map(''.join,zip(repeat('x'),map(str,count(1)) ))
         l,r = [],self._fmt
@@ -150,6 +207,8 @@ class _ShotCut:
         if apply is None:
             if len(args)!= self._arity:
                 raise ArityError(self,self._arity,len(args))
+            if self._src is not None:
+                return self.compiled(*args)
             if not isinstance(self._call,tuple):
                 return self._call(*args)
             
@@ -201,8 +260,8 @@ class _ShotCut:
     __rand__ = fmap(operator.and_,"other & self")
     __ror__ = fmap(operator.or_,"other | self")
     __rxor__ = fmap(operator.xor,"other ^ self")
-    __matmul__= fmap(lambda a,b: isinstance(a,b),"self @ other")
-    __rmatmul__= fmap(lambda a,b: isinstance(a,b),"other @ self")
+    __matmul__= fmap(lambda a,b: isinstance(a,b),"self @ other","isinstance(self,other)")
+    __rmatmul__= fmap(lambda a,b: isinstance(a,b),"other @ self","isinstance(self,other)")
 
     in_ = fmap(lambda a,b: a in b,"self in other")
     not_in = fmap(lambda a,b: a not in b,"self not in other")
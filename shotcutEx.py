@@ -7,6 +7,7 @@ import operator
 from holder import _ as hd
 # import toolz.curried as curried
 import re
+import ast
 __all__ = ['_'] + [f"_{i}" for i in range(1,21)]
 
 
@@ -27,8 +28,194 @@ def _replace_isolated_x(txt, args, fix=0):
         return mapping.get(match.group(0), match.group(0))
     
     return re.sub(pattern, repl, txt)
+_LITERAL_TYPES = (int, float, complex, str, bytes, bool, type(None))
+_BIN_OPS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod,
+    ast.Pow: operator.pow, ast.LShift: operator.lshift, ast.RShift: operator.rshift,
+    ast.BitAnd: operator.and_, ast.BitOr: operator.or_, ast.BitXor: operator.xor,
+}
+_UNARY_OPS = {ast.USub: operator.neg, ast.UAdd: operator.pos, ast.Invert: operator.invert, ast.Not: operator.not_}
+_CMP_OPS = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt, ast.LtE: operator.le,
+    ast.Gt: operator.gt, ast.GtE: operator.ge, ast.In: lambda a, b: a in b, ast.NotIn: lambda a, b: a not in b,
+}
+# 可安全合并的子表达式类型（函数调用可能有副作用或返回迭代器，不参与合并）
+_CSE_NODES = (ast.BinOp, ast.UnaryOp, ast.Compare, ast.Subscript)
+# 惰性求值的节点：内部的子表达式不能提前计算
+_LAZY_NODES = (ast.Lambda, ast.GeneratorExp, ast.ListComp, ast.SetComp, ast.DictComp)
+
+
+def _is_small(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value.bit_length() <= 128
+    if isinstance(value, (str, bytes)):
+        return len(value) <= 256
+    return True
+
+
+class _ConstFolder(ast.NodeTransformer):
+    """把 env 中的字面量常量内联，并折叠全常量的运算子树"""
+    def __init__(self, env, params):
+        self.env = env
+        self.params = params
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load) and node.id not in self.params and node.id in self.env:
+            value = self.env[node.id]
+            if type(value) in _LITERAL_TYPES and _is_small(value):
+                return ast.copy_location(ast.Constant(value), node)
+        return node
+
+    def _fold(self, node, func, *operands):
+        if not all(isinstance(i, ast.Constant) for i in operands):
+            return node
+        try:
+            value = func(*(i.value for i in operands))
+        except Exception:
+            return node  # 留到运行时抛出
+        if type(value) in _LITERAL_TYPES and _is_small(value):
+            return ast.copy_location(ast.Constant(value), node)
+        return node
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        op = _BIN_OPS.get(type(node.op))
+        return node if op is None else self._fold(node, op, node.left, node.right)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        return self._fold(node, _UNARY_OPS[type(node.op)], node.operand)
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if len(node.ops) != 1 or type(node.ops[0]) not in _CMP_OPS:
+            return node
+        return self._fold(node, _CMP_OPS[type(node.ops[0])], node.left, node.comparators[0])
+
+
+def _eager_fields(node):
+    """node 中一定会被求值的子节点所在的 (字段, 下标)；短路与条件分支只取首个操作数"""
+    if isinstance(node, _LAZY_NODES):
+        return []
+    if isinstance(node, ast.BoolOp):
+        return [('values', 0)]
+    if isinstance(node, ast.IfExp):
+        return [('test', None)]
+    if isinstance(node, ast.Compare):
+        return [('left', None), ('comparators', 0)]
+    fields = []
+    for name, value in ast.iter_fields(node):
+        if isinstance(value, ast.AST):
+            fields.append((name, None))
+        elif isinstance(value, list):
+            fields.extend((name, i) for i, v in enumerate(value) if isinstance(v, ast.AST))
+    return fields
+
+
+def _get_field(node, name, i):
+    value = getattr(node, name)
+    return value if i is None else value[i]
+
+
+def _eager_nodes(node):
+    """后序遍历一定会被求值的节点"""
+    for name, i in _eager_fields(node):
+        yield from _eager_nodes(_get_field(node, name, i))
+    yield node
+
+
+def _replace(node, key, name):
+    if isinstance(node, _CSE_NODES) and ast.dump(node) == key:
+        return ast.copy_location(ast.Name(name, ast.Load()), node)
+    for field, i in _eager_fields(node):
+        new = _replace(_get_field(node, field, i), key, name)
+        if i is None:
+            setattr(node, field, new)
+        else:
+            getattr(node, field)[i] = new
+    return node
+
+
+def _hoist_common(body):
+    """把重复出现的子表达式提取为局部变量，返回 (赋值语句列表, 新表达式)"""
+    assigns = []
+    while True:
+        seen = {}
+        for node in _eager_nodes(body):
+            if isinstance(node, _CSE_NODES) and isinstance(getattr(node, 'ctx', ast.Load()), ast.Load):
+                key = ast.dump(node)
+                seen[key] = seen.get(key, 0) + 1
+                if seen[key] == 2:
+                    break
+        else:
+            return assigns, body
+        name = f"_t{len(assigns)}"
+        assigns.append(ast.Assign([ast.Name(name, ast.Store())], node))
+        body = _replace(body, key, name)
+
+
+def _build(expr, env):
+    """编译前的优化：常量折叠、公共子表达式提取"""
+    tree = ast.parse(expr, mode='eval')
+    lam = tree.body
+    if not isinstance(lam, ast.Lambda):
+        return eval(expr, env)
+    a = lam.args
+    params = {i.arg for i in a.posonlyargs + a.args + a.kwonlyargs}
+    params.update(i.arg for i in (a.vararg, a.kwarg) if i is not None)
+    body = _ConstFolder(env, params).visit(lam.body)
+    assigns, body = _hoist_common(body)
+    if not assigns:
+        code = compile(ast.fix_missing_locations(ast.Expression(ast.Lambda(a, body))), '<shotcutEx>', 'eval')
+        return eval(code, env)
+    func = ast.FunctionDef('_shotcut', a, assigns + [ast.Return(body)], [], None, None)
+    code = compile(ast.fix_missing_locations(ast.Module([func], [])), '<shotcutEx>', 'exec')
+    ns = {}
+    exec(code, env, ns)
+    return ns['_shotcut']
+
+_compiled = {}  # (expr, env指纹) → 编译好的函数，相同表达式共享
+_COMPILED_MAX = 4096
+
+def _compile(expr, env):
+    # env 中的值可能不可哈希，按 id 取指纹；缓存的函数以 env 为 globals，会持有这些对象，id 不会被复用
+    key = (expr, tuple((k, id(v)) for k, v in env.items() if k != '__builtins__'))
+    func = _compiled.get(key)
+    if func is None:
+        func = _build(expr, env)
+        if len(_compiled) >= _COMPILED_MAX:
+            del _compiled[next(iter(_compiled))]
+        _compiled[key] = func
+    return func
+
+def _paren(body):
+    # 复合表达式加括号，避免替换进新表达式后优先级出错，如 (_1 + 1) * (_1 + 1)
+    body = body.strip()
+    return body if body.isidentifier() else f"({body})"
+
 def _random_name(n=14):
     return ''.join(random.choice(string.ascii_lowercase.replace("x","").replace("k","")) for _ in range(n))
+
+def _bind(env, value):
+    # 同一对象在 env 中只占一项，已存在时复用其名字
+    for k, v in env.items():
+        if v is value and k != '__builtins__':
+            return k
+    name = _random_name()
+    env[name] = value
+    return name
+
+def _merge_env(env, other_env, body):
+    # 合并 other_env，对象已以其它名字存在于 env 时改写 body 中的引用
+    for k, v in other_env.items():
+        if k in env or k == '__builtins__':
+            env[k] = v
+            continue
+        name = _bind(env, v)
+        if name != k:
+            body = re.sub(r'(?<!\w)' + re.escape(k) + r'(?!\w)', name, body)
+    return body
 def unary_fmap(expr_val,env_val=None):
     def applyier(self):
         nonlocal expr_val,env_val
@@ -37,7 +224,7 @@ def unary_fmap(expr_val,env_val=None):
         env.update(self.env)
         l,r = self.expr.split(':',1)
         expr = expr_val.expr if isinstance(expr_val,cls) else expr_val
-        body = f"({r.strip()})" if not isinstance(self.ix,int) else r.strip()
+        body = _paren(r)
         expr = expr.replace('self',body)
         expr = f"{l} : {expr}"
         return cls(expr,env,self.arity,self.ix)
@@ -52,15 +239,14 @@ def fmap(expr_val,env_val=None):
         env = env_val.copy() if env_val is not None else {}
         env.update(self.env)
         l,r = self.expr.split(':',1)
-        body = f"({r.strip()})" if not isinstance(self.ix,int) else r.strip()
+        body = _paren(r)
         
         if isinstance(other,cls):
             l2,r2 = other.expr.split(':',1)
             # print(expr_val,'----000077777777777')
-            body2 = f"({r2.strip()})" if  not isinstance(other.ix,int)  else r2.strip()
+            body2 = _merge_env(env,other.env,_paren(r2))
             expr = expr_val.replace('self',body).replace('other',body2)
             # print(expr,'----0000')
-            env.update(other.env)
             l_replaced = l.replace("lambda ","",1).replace(",*_,**__","",1).replace("*_,**__","",1)
             l2_replaced = l2.replace("lambda ","",1).replace(",*_,**__","",1).replace("*_,**__","",1)
             args_l = l_replaced.split(",")
@@ -107,10 +293,9 @@ def fmap(expr_val,env_val=None):
             # print(expr,'----2222')
             return cls(expr,env,arity,ix)
         else:
-            name = _random_name()
+            name = _bind(env,other)
             expr = expr_val.replace('self',body).replace('other',name)
             expr = f"{l} : {expr}"
-            env[name] = other
             return cls(expr,env,self.arity,self.ix)
     
     return applyier
@@ -154,7 +339,12 @@ class _IndexHolder:
         return hash(self.expr)
     @property
     def call(self):
-        return eval(self.expr,self.env)
+        # 对象不可变，lambda 只需编译一次
+        func = self.__dict__.get('_func')
+        if func is None:
+            func = _compile(self.expr,self.env)
+            super().__setattr__('_func',func)
+        return func
     
     def __str__(self):
         expr = self.expr.replace('lambda ','',1).replace(',*_,**__','',1).replace('*_,**__','',1)
@@ -245,8 +435,7 @@ class _IndexHolder:
         #     if result is not None:
         #         return result
         env=self.env.copy()
-        attr_name = _random_name()
-        env[attr_name] = name
+        attr_name = _bind(env,name)
         if self.ix is None:
             return self.__class__(f"lambda x,*_,**__: getattr(x,{attr_name})",env,self.arity,self.ix)
         return self.__class__(f"lambda x{self.ix},*_,**__: getattr(x{self.ix},{attr_name})",env,self.arity,self.ix)
@@ -1,26 +1,831 @@
 
 
 from concurrent.futures import ThreadPoolExecutor,ProcessPoolExecutor
+from concurrent.futures import BrokenExecutor,Future,wait,FIRST_COMPLETED
+from concurrent.futures import TimeoutError as _FutureTimeout
 from collections.abc import Iterable
-from functools import wraps
+from collections import deque,namedtuple
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing import resource_tracker
+from contextlib import contextmanager
+from itertools import islice,chain
+from functools import wraps,partial,update_wrapper
+from time import perf_counter,thread_time
+import threading
+import asyncio
+import inspect
+import atexit
+import os
+import sys
+import glob
+import pickle
+import multiprocessing
 
-__all__ = ['trd','vic_execute','for_','proc']
-def vic_execute(func=None,max_workers=3,use_process = False):
+__all__ = ['trd','vic_execute','for_','proc','get_pool','shutdown_pools','state','micro_batch']
+
+_pools = {}  # (use_process, max_workers, initializer, initargs) → 共享的执行器
+_pools_lock = threading.Lock()
+_UNSET = object()
+_local = threading.local()  # 记录当前线程所属的共享线程池，防止嵌套调用死锁
+state = threading.local()  # 每个工作线程/进程各自的状态，由 initializer 填充，被装饰函数读取
+
+def _numa_nodes():
+    # Linux 下各 NUMA 节点的 CPU 集合，读不到时返回空列表
+    nodes = []
+    for path in sorted(glob.glob('/sys/devices/system/node/node[0-9]*/cpulist')):
+        cpus = set()
+        with open(path) as f:
+            for part in f.read().strip().split(','):
+                if part:
+                    lo,_,hi = part.partition('-')
+                    cpus.update(range(int(lo),int(hi or lo) + 1))
+        if cpus:
+            nodes.append(cpus)
+    return nodes
+
+def _affinity_layout(affinity):
+    """
+    把 affinity 参数展开成 CPU 集合列表，第 i 个工作进程绑定到 layout[i % len(layout)]
+        'round_robin' / True: 每个进程绑定一个 CPU，依次轮转
+        'numa': 每个进程绑定一个 NUMA 节点的全部 CPU，节点依次轮转
+        列表: 元素为 CPU 编号或 CPU 编号集合
+    不支持 os.sched_setaffinity 的平台返回 None（忽略）
+    """
+    if not affinity or not hasattr(os,'sched_setaffinity'):
+        return None
+    allowed = os.sched_getaffinity(0)
+    if affinity is True or affinity == 'round_robin':
+        layout = [{cpu} for cpu in sorted(allowed)]
+    elif affinity == 'numa':
+        layout = [node & allowed for node in _numa_nodes()] or [allowed]
+        layout = [node for node in layout if node] or [allowed]
+    elif isinstance(affinity,(list,tuple)):
+        layout = [{cpus} if isinstance(cpus,int) else set(cpus) for cpus in affinity]
+    else:
+        raise ValueError(f"无效的 affinity: {affinity!r}，可用 'round_robin'、'numa' 或 CPU 列表")
+    return tuple(frozenset(cpus) for cpus in layout)
+
+def _init_worker(key,initializer,initargs,layout=None,counter=None):
+    # 进程池的任务在工作进程的主线程中执行，线程池的 initializer 在各工作线程中执行，state 都是每个工作者一份
+    _local.pool_key = key
+    if layout:
+        with counter.get_lock():
+            index = counter.value
+            counter.value += 1
+        os.sched_setaffinity(0,layout[index % len(layout)])
+    if initializer is not None:
+        initializer(*initargs)
+
+def _pool_key(max_workers,use_process,initializer=None,initargs=(),layout=None):
+    try:
+        hash(initargs)
+    except TypeError:
+        initargs = id(initargs)
+    return (bool(use_process),max_workers,initializer,initargs,layout)
+
+def _new_pool(key,max_workers,use_process,initializer=None,initargs=(),layout=None):
+    if use_process:
+        counter = multiprocessing.Value('i',0) if layout else None  # 给工作进程分配 layout 中的序号
+        return ProcessPoolExecutor(max_workers=max_workers,initializer=_init_worker,
+                                   initargs=(key,initializer,initargs,layout,counter))
+    return ThreadPoolExecutor(max_workers=max_workers,initializer=_init_worker,initargs=(key,initializer,initargs))
+
+def _default_workers(use_process):
+    # max_workers=None 时执行器自行决定工作数，在途窗口等按相同的默认值计算
+    cpus = os.cpu_count() or 1
+    return cpus if use_process else min(32,cpus + 4)
+
+def get_pool(max_workers=3,use_process=False,initializer=None,initargs=(),affinity=None):
+    """取得（首次使用时创建）同一配置共享的执行器，解释器退出时统一关闭"""
+    layout = _affinity_layout(affinity) if use_process else None
+    key = _pool_key(max_workers,use_process,initializer,initargs,layout)
+    with _pools_lock:
+        executor = _pools.get(key)
+        if executor is None:
+            executor = _pools[key] = _new_pool(key,max_workers,use_process,initializer,initargs,layout)
+    return executor
+
+def shutdown_pools(wait=True,max_workers=None,use_process=None):
+    """关闭共享执行器，默认全部关闭；之后再使用会重新创建"""
+    with _pools_lock:
+        keys = [k for k in _pools
+                if (use_process is None or k[0] == bool(use_process))
+                and (max_workers is None or k[1] == max_workers)]
+        executors = [_pools.pop(k) for k in keys]
+    for executor in executors:
+        executor.shutdown(wait=wait)
+
+def _discard_pool(key,executor):
+    with _pools_lock:
+        if _pools.get(key) is executor:
+            del _pools[key]
+
+atexit.register(shutdown_pools)
+if hasattr(os,'register_at_fork'):
+    # 子进程继承的执行器对象没有可用的工作线程，直接丢弃
+    os.register_at_fork(after_in_child=_pools.clear)
+
+@contextmanager
+def _executor(max_workers,use_process,shared,initializer=None,initargs=(),affinity=None):
+    layout = _affinity_layout(affinity) if use_process else None
+    key = _pool_key(max_workers,use_process,initializer,initargs,layout)
+    # 在同一共享线程池的工作线程内再次调用时用独立的池，避免等待自身所在的池
+    if not shared or getattr(_local,'pool_key',None) == key:
+        with _new_pool(key,max_workers,use_process,initializer,initargs,layout) as executor:
+            yield executor
+        return
+    executor = get_pool(max_workers,use_process,initializer,initargs,affinity)
+    try:
+        yield executor
+    except BrokenExecutor:
+        _discard_pool(key,executor)
+        raise
+
+def _rerun_on_broken(run,its,retry=True):
+    """
+    run(元素迭代器) 产出结果；共享进程池在产出第一个结果之前损坏时（多为池在被装饰函数定义之前已 fork，
+    工作进程找不到该函数），在新池上重跑一次，已取出的元素重新提交。已产出结果后损坏照常抛出
+    """
+    its = iter(its)
+    taken = []
+    def feed():
+        for x in its:
+            if taken is not None:
+                taken.append(x)
+            yield x
+    results = run(feed())
+    try:
+        first = next(results,_UNSET)
+    except BrokenExecutor:
+        if not retry:
+            raise
+        results = run(chain(taken,its))
+        first = next(results,_UNSET)
+    taken = None
+    if first is _UNSET:
+        return
+    yield first
+    yield from results
+
+class _Autoscaler:
+    """
+    爬山法调整在途任务数：每个采样周期比较吞吐（完成数/秒），
+    上升则沿原方向继续并加大步长，下降则反向并把步长重置为 1
+    """
+    def __init__(self,min_workers,max_workers,start=None,interval=0.2):
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.limit = self._clamp(start or min_workers)
+        self.interval = interval
+        self.direction = 1
+        self.step = 1
+        self.rate = None
+        self.count = 0
+        self.since = perf_counter()
+        self.history = []  # (并发数, 吞吐)
+
+    def _clamp(self,n):
+        return max(self.min_workers,min(self.max_workers,n))
+
+    def record(self,n=1):
+        self.count += n
+        now = perf_counter()
+        elapsed = now - self.since
+        if elapsed < self.interval or self.count < self.limit:
+            return
+        rate = self.count / elapsed
+        self.history.append((self.limit,rate))
+        if self.rate is not None:
+            if rate < self.rate:
+                self.direction = -self.direction
+                self.step = 1
+            else:
+                self.step *= 2
+        self.rate = rate
+        limit = self._clamp(self.limit + self.direction * self.step)
+        if limit == self.limit:  # 碰到边界，下一轮往回探
+            self.direction = -self.direction
+            self.step = 1
+        self.limit = limit
+        self.count = 0
+        self.since = now
+
+class _Start:
+    """任务开始运行的时刻：线程池由工作线程在执行前记录，进程池近似为提交时刻"""
+    __slots__ = ('time',)
+    def __init__(self,time=None):
+        self.time = time
+
+def _mark_start(start,func,x):
+    start.time = perf_counter()
+    return func(x)
+
+def _expired(x):
+    # 截止时间已到、未提交的元素：以已完成的 future 占位，使结果与输入一一对应
+    future = Future()
+    future.set_exception(TimeoutError("截止时间已到，任务未提交"))
+    return future
+
+def _outcome(future,until,return_exceptions,step=None,abandon=None):
+    """
+    取任务结果，最多等到 until() 给出的时刻；超时则取消任务，异常按 return_exceptions 返回或抛出
+
+    step 不为 None 时截止时刻可能推迟（任务尚未开始运行，单项超时还没开始计时），每次最多等 step 秒后重新计算；
+    已在运行、无法取消的任务交给 abandon 处理
+    """
+    try:
+        while True:
+            t = until()
+            left = None if t is None else max(t - perf_counter(),0)
+            limit = step() if step else None
+            if limit is None or (left is not None and left <= limit):
+                return future.result(timeout=left)
+            try:
+                return future.result(timeout=limit)
+            except _FutureTimeout:
+                if future.done():
+                    raise
+    except Exception as e:
+        if not future.done():
+            # 已在运行的任务无法中止，只是不再等待
+            if not future.cancel() and abandon:
+                abandon(future)
+            e = TimeoutError("任务超时")
+        # 执行器损坏不是单个元素的失败，总是抛出，由调用方决定是否换新池重跑
+        if not return_exceptions or isinstance(e,BrokenExecutor):
+            raise e
+        return e
+
+def _stream(executor,func,its,window,ordered=True,scaler=None,
+            timeout=None,deadline=None,return_exceptions=False,with_items=False,abandon=None):
+    """
+    最多 window 个任务同时在途（有 scaler 时由其动态决定），取走一个结果再提交下一个
+
+    timeout 为单个任务从开始运行起的最长秒数（进程池无法得知开始时刻，从提交起算），
+    deadline 为整体截止时刻（perf_counter），截止后不再提交新任务，在途任务超时，
+    未提交的元素得到 TimeoutError；with_items 为 True 时产出 (元素, 结果)；
+    结果不会被取走的任务（超时仍在运行，或流提前结束时在途）交给 abandon
+    """
+    its = iter(its)
+    pending = deque() if ordered else set()
+    add = pending.append if ordered else pending.add
+    submitted = {}  # future → (元素, 开始时刻)
+    # 线程池中排队等待的任务不计入单项超时
+    track = timeout is not None and isinstance(executor,ThreadPoolExecutor)
+    def fill():
+        limit = scaler.limit if scaler else window
+        for x in islice(its,max(limit - len(pending),0)):
+            if deadline is not None and perf_counter() >= deadline:
+                future,start = _expired(x),_Start()
+            elif track:
+                start = _Start()
+                future = executor.submit(_mark_start,start,func,x)
+            else:
+                start = _Start(perf_counter())
+                future = executor.submit(func,x)
+            submitted[future] = (x,start)
+            add(future)
+    def until(future):
+        start = submitted[future][1].time
+        t = None if timeout is None or start is None else start + timeout
+        return deadline if t is None else t if deadline is None else min(t,deadline)
+    def waiting(future):
+        # 尚未开始的任务最早也要 timeout 秒后才会超时，到时重新检查
+        return timeout if track and submitted[future][1].time is None and not future.done() else None
+    def emit(future):
+        result = _outcome(future,partial(until,future),return_exceptions,partial(waiting,future),abandon)
+        x,_ = submitted.pop(future)
+        if scaler:
+            scaler.record()
+        fill()
+        return (x,result) if with_items else result
+    fill()
+    try:
+        if ordered:
+            while pending:
+                yield emit(pending.popleft())
+        else:
+            while pending:
+                untils = [t for t in map(until,pending) if t is not None]
+                untils += [perf_counter() + t for t in map(waiting,pending) if t is not None]
+                wait_for = max(min(untils) - perf_counter(),0) if untils else None
+                done,_ = wait(pending,timeout=wait_for,return_when=FIRST_COMPLETED)
+                now = perf_counter()
+                done |= {f for f in pending if until(f) is not None and until(f) <= now}
+                pending.difference_update(done)
+                for future in done:
+                    yield emit(future)
+    finally:
+        for future in pending:
+            if not future.cancel() and abandon:
+                abandon(future)
+
+def _run_chunk(func,chunk,return_exceptions=False):
+    # 在工作线程/进程中执行一批元素，同时返回纯计算耗时
+    start = perf_counter()
+    if return_exceptions:
+        results = []
+        for x in chunk:
+            try:
+                results.append(func(x))
+            except Exception as e:
+                results.append(e)
+    else:
+        results = []
+        try:
+            for x in chunk:
+                results.append(func(x))
+        except BaseException:
+            # 整批失败时结果不会返回，先释放批内已写入共享内存的结果
+            for ref in results:
+                if isinstance(ref,_ShmArray):
+                    _release(_untracked(ref.name))
+            raise
+    return results,perf_counter() - start
+
+class _ChunkSizer:
+    """根据已完成批次的单元素耗时调整批大小，使每批耗时接近 target 秒"""
+    def __init__(self,chunksize='auto',target=0.02,limit=8192):
+        self.adaptive = chunksize == 'auto'
+        self.size = 1 if self.adaptive else int(chunksize)
+        self.target = target
+        self.limit = limit
+        self.per_item = None
+
+    def update(self,n,elapsed):
+        if not self.adaptive:
+            return
+        per_item = elapsed / n
+        self.per_item = per_item if self.per_item is None else 0.7 * self.per_item + 0.3 * per_item
+        want = self.target / self.per_item if self.per_item > 0 else self.limit
+        # 每次最多翻倍，避免早期的噪声测量让批大小暴涨
+        self.size = max(1,min(self.limit,2 * self.size,int(want)))
+
+    def chunks(self,its):
+        its = iter(its)
+        while True:
+            chunk = list(islice(its,self.size))
+            if not chunk:
+                return
+            yield chunk
+
+def _stream_chunks(executor,func,its,window,ordered,sizer,return_exceptions=False,with_items=False,**kwargs):
+    # 分批时 timeout 按批计算；整批超时或失败时，批内每个元素都得到该异常
+    run = partial(_run_chunk,func,return_exceptions=return_exceptions)
+    for chunk,out in _stream(executor,run,sizer.chunks(its),window,ordered,
+                             return_exceptions=return_exceptions,with_items=True,**kwargs):
+        if isinstance(out,BaseException):
+            results = [out] * len(chunk)
+        else:
+            results,elapsed = out
+            sizer.update(len(results),elapsed)
+        yield from zip(chunk,results) if with_items else results
+
+_ShmArray = namedtuple('_ShmArray',['name','shape','dtype'])  # 共享内存中的数组描述符
+
+def _to_shm(value,create=SharedMemory):
+    """把 ndarray 复制进新的共享内存块，返回 (描述符, 块)；其它对象原样返回 (value, None)"""
+    np = sys.modules.get('numpy')  # 没导入过 numpy 就不可能有 ndarray
+    if np is None or not isinstance(value,np.ndarray) or value.nbytes == 0:
+        return value,None
+    shm = create(create=True,size=value.nbytes)
+    np.ndarray(value.shape,value.dtype,buffer=shm.buf)[...] = value
+    return _ShmArray(shm.name,value.shape,value.dtype),shm
+
+def _release(shm):
+    # 工作进程与主进程共用 resource_tracker 时，工作进程的注销也会抹掉主进程的登记，unlink 前补登记
+    resource_tracker.register(shm._name,'shared_memory')
+    shm.close()
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+def _from_shm(ref):
+    # 主进程读取工作进程写入的结果：复制出来后立即释放共享内存块
+    import numpy as np
+    shm = SharedMemory(name=ref.name)
+    try:
+        return np.array(np.ndarray(ref.shape,ref.dtype,buffer=shm.buf))
+    finally:
+        _release(shm)
+
+def _untracked(name=None,create=False,size=0):
+    # 工作进程中的块由主进程负责释放，不登记到工作进程的 resource_tracker（3.13+ 支持 track=False）
+    try:
+        return SharedMemory(name=name,create=create,size=size,track=False)
+    except TypeError:
+        shm = SharedMemory(name=name,create=create,size=size)
+        resource_tracker.unregister(shm._name,'shared_memory')
+        return shm
+
+def _shm_call(func,x):
+    # 在工作进程中执行：参数直接映射共享内存，不经过 pickle；ndarray 结果写入新的共享内存块
+    shm = None
+    if isinstance(x,_ShmArray):
+        import numpy as np
+        shm = _untracked(x.name)
+        x = np.ndarray(x.shape,x.dtype,buffer=shm.buf)
+    try:
+        result = func(x)
+        ref,out = _to_shm(result,_untracked)
+        if out is not None:
+            out.close()  # 由主进程读取后释放
+        return ref
+    finally:
+        if shm is not None:
+            x = result = None
+            try:
+                shm.close()
+            except BufferError:
+                pass  # func 仍持有视图时交给垃圾回收
+
+def _release_abandoned(future):
+    # 被放弃的任务完成后释放它在工作进程中创建的结果块（分批时结果为 (结果列表, 耗时)）
+    if future.cancelled() or future.exception() is not None:
+        return
+    out = future.result()
+    refs = out[0] if isinstance(out,tuple) and not isinstance(out,_ShmArray) else [out]
+    for ref in refs:
+        if isinstance(ref,_ShmArray):
+            try:
+                _release(SharedMemory(name=ref.name))
+            except FileNotFoundError:
+                pass
+
+def _stream_shm(run,func,its,window,ordered,with_items=False,**kwargs):
+    """
+    ndarray 参数和结果经共享内存传递，每个元素完成后释放其参数块；
+    结果未被取走的任务（超时、出错或提前结束）在完成时释放其结果块
+    """
+    blocks = {}
+    originals = {}  # 块名 → 原始参数，with_items 时还原
+    def share(x):
+        ref,shm = _to_shm(x)
+        if shm is not None:
+            blocks[ref.name] = shm
+            if with_items:
+                originals[ref.name] = x
+        return ref
+    try:
+        abandon = lambda future: future.add_done_callback(_release_abandoned)
+        for x,result in run(partial(_shm_call,func),map(share,its),window,ordered,with_items=True,
+                            abandon=abandon,**kwargs):
+            if isinstance(x,_ShmArray):
+                _release(blocks.pop(x.name))
+                x = originals.pop(x.name,x)
+            result = _from_shm(result) if isinstance(result,_ShmArray) else result
+            yield (x,result) if with_items else result
+    finally:
+        for shm in blocks.values():
+            _release(shm)
+
+def _learn_key(cost_key,x):
+    # 学习耗时用的键；不可哈希的键（列表、数组等）视为未知，返回 None：估计取平均值，也不记录
+    k = cost_key(x) if cost_key else x
+    try:
+        hash(k)
+    except TypeError:
+        return None
+    return k
+
+def _learn(costs,k,elapsed):
+    if k is not None:
+        costs[k] = elapsed if k not in costs else 0.5 * costs[k] + 0.5 * elapsed
+
+def _stream_lpt(run,func,its,window,ordered,cost,costs=None,cost_key=None,**kwargs):
+    """
+    最长任务优先：按估计耗时从大到小提交，结果仍按输入顺序返回（ordered=False 时按完成顺序）
+
+    cost 为估计耗时的函数；为 'learn' 时用 costs 中按 cost_key(元素) 记录的实测耗时（提交到完成），
+    没有记录的键与不可哈希的键取已知估计的平均值
+    """
+    items = list(its)
+    key = partial(_learn_key,cost_key)
+    if callable(cost):
+        estimate = cost
+    else:
+        default = sum(costs.values()) / len(costs) if costs else 0
+        estimate = lambda x: costs.get(key(x),default)
+    order = sorted(range(len(items)),key=lambda i: estimate(items[i]),reverse=True)
+    slots = {}  # id(元素) → 对应的输入位置；相同对象的多个位置可以任意分配
+    started = {}
+    def feed():
+        for i in order:
+            x = items[i]
+            slots.setdefault(id(x),deque()).append(i)
+            started[i] = perf_counter()
+            yield x
+    results = [_UNSET] * len(items)  # 区分未处理的位置与返回 None 的元素
+    for x,result in run(func,feed(),window,False,with_items=True,**kwargs):
+        i = slots[id(x)].popleft()
+        if costs is not None and not isinstance(result,BaseException):
+            _learn(costs,key(x),perf_counter() - started[i])
+        if not ordered:
+            yield result
+        results[i] = result
+    if ordered:
+        # 截止时间使流提前结束时，未处理的位置与非最长优先路径一样得到 TimeoutError
+        yield from (TimeoutError("截止时间已到，任务未提交") if r is _UNSET else r for r in results)
+
+def _remaining(timeout,deadline):
+    left = None if deadline is None else deadline - perf_counter()
+    return timeout if left is None else left if timeout is None else min(timeout,left)
+
+async def _astream(func,its,max_workers,window,ordered=True,timeout=None,deadline=None,return_exceptions=False):
+    """协程版 _stream：最多 window 个任务在途，信号量限制同时运行的协程数；timeout 从协程开始运行时算起"""
+    sem = asyncio.Semaphore(max_workers)
+    async def run(x):
+        async with sem:
+            limit = _remaining(timeout,deadline)
+            try:
+                if deadline is not None and perf_counter() >= deadline:
+                    raise TimeoutError("截止时间已到，任务未提交")
+                if limit is None:
+                    return await func(x)
+                return await asyncio.wait_for(func(x),max(limit,0))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return e
+    def more(n):
+        # 截止后的元素同样创建任务，立即得到 TimeoutError，结果与输入一一对应
+        return [asyncio.ensure_future(run(x)) for x in islice(its,n)]
+    its = iter(its)
+    pending = deque(more(window))
+    try:
+        if ordered:
+            while pending:
+                result = await pending.popleft()
+                pending.extend(more(1))
+                yield result
+        else:
+            pending = set(pending)
+            while pending:
+                done,pending = await asyncio.wait(pending,return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.update(more(1))
+                    yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def _acollect(agen):
+    return [result async for result in agen]
+
+def _drive(agen):
+    # 在同步代码中用私有事件循环逐个取出异步生成器的结果
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(agen.aclose())
+        loop.close()
+
+def _in_running_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+def _profile(func,its,n,return_exceptions=False,initializer=None,initargs=(),
+             timeout=None,deadline=None,costs=None,cost_key=None):
+    """
+    在 n 个线程上试跑前 n 个元素，比较各线程 CPU 时间之和与墙钟时间：
+    CPU 时间远小于墙钟（等待 I/O）或明显超过墙钟（释放 GIL 并行执行）适合线程，
+    接近墙钟（持有 GIL 的纯 Python 计算）适合进程
+    试跑的线程同样执行 initializer，timeout / deadline 与正式执行的处理方式相同；
+    costs 不为 None 时记录试跑元素的实测耗时
+    返回 (试跑结果, 是否用进程)，没有元素时返回 ([], None)
+    """
+    sample = list(islice(its,n))
+    if not sample:
+        return [],None
+    def timed(x):
+        start,wall = thread_time(),perf_counter()
+        try:
+            result = func(x)
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            result = e
+        return result,thread_time() - start,perf_counter() - wall
+    key = _pool_key(len(sample),False,initializer,initargs)
+    results,cpu = [],0.0
+    start = perf_counter()
+    executor = _new_pool(key,len(sample),False,initializer,initargs)
+    try:
+        for x,out in _stream(executor,timed,sample,len(sample),timeout=timeout,deadline=deadline,
+                             return_exceptions=return_exceptions,with_items=True):
+            if isinstance(out,BaseException):  # 超时
+                results.append(out)
+                continue
+            result,used,elapsed = out
+            results.append(result)
+            cpu += used
+            if costs is not None and not isinstance(result,BaseException):
+                _learn(costs,_learn_key(cost_key,x),elapsed)
+    finally:
+        executor.shutdown(wait=False,cancel_futures=True)  # 超时的试跑任务不再等待
+    wall = perf_counter() - start
+    return results,0.5 * wall <= cpu <= 1.5 * wall
+
+def _picklable(func):
+    try:
+        pickle.dumps(func)
+    except Exception:
+        return False
+    return True
+
+def vic_execute(func=None,max_workers=3,use_process = False,shared=True,stream=False,window=None,ordered=True,
+                chunksize=None,chunk_time=0.02,autoscale=False,min_workers=1,
+                timeout=None,deadline=None,return_exceptions=False,shm=False,cost=None,cost_key=None,
+                initializer=None,initargs=(),affinity=None,backend=None):
+    """
+    把处理单个元素的函数变成并发处理可迭代对象的函数
+
+    参数:
+        max_workers: 工作线程/进程数，None 时使用执行器的默认值
+        use_process: 是否使用进程池
+        shared: 是否复用同一配置的共享执行器；共享进程池在产出第一个结果之前损坏时
+            （如池在被装饰函数定义之前已启动），换新池重跑一次
+        stream: 为 True 时返回生成器，按需提交任务，内存占用与输入长度无关
+        window: 流式模式下最多同时在途的任务数，默认 max_workers 的两倍
+        ordered: 为 False 时按完成顺序返回结果
+        chunksize: 每个任务处理的元素数；'auto' 时根据已完成批次的耗时自动调整
+        chunk_time: chunksize='auto' 时每批的目标耗时（秒）
+        autoscale: 为 True 时在 [min_workers, max_workers] 内按实测吞吐自动调整并发数，
+            收敛值记录在被装饰函数的 workers 属性上，作为下次调用的起点
+        min_workers: autoscale 时的最小并发数
+        timeout: 单个元素从开始运行起的最长秒数（分批时按批；进程池从提交起算，在途任务数限制为 max_workers），
+            超时的元素得到 TimeoutError
+        deadline: 整个调用的最长秒数，到期后取消未完成的任务、不再提交新元素，未完成和未提交的元素都得到 TimeoutError
+        return_exceptions: 为 True 时异常（含超时）作为对应元素的结果返回，而不是中断整个调用
+        shm: use_process 时把 NumPy 数组参数和结果放进共享内存，只传递 (名字, 形状, dtype)，
+            参数块在对应元素完成后释放，结果在主进程中复制出来后释放
+        cost: 估计单个元素耗时的函数，按最长任务优先提交以缩短总耗时，结果仍按输入顺序返回；
+            为 'learn' 时按 cost_key(元素) 记录实测耗时，保存在被装饰函数的 costs 属性上供之后调用使用；
+            键不可哈希（如列表、数组）时该元素按平均耗时估计，不记录
+        initializer, initargs: 每个工作线程/进程启动时执行一次 initializer(*initargs)，
+            可把模型、查找表等放进 trd.state，被装饰函数从 state 中读取；不同 initializer 使用不同的共享池
+        affinity: use_process 时把工作进程绑定到 CPU（仅 Linux）：'round_robin' 每进程一个 CPU，
+            'numa' 每进程一个 NUMA 节点，或给出 CPU 编号/集合的列表
+        backend: 'thread' / 'process' 指定执行器，覆盖 use_process；'auto' 时先在几个线程上试跑前几个元素，
+            按 CPU 时间与墙钟时间的比例选择线程或进程（函数不能 pickle 时只用线程），
+            选择结果记录在被装饰函数的 backend 属性上，之后的调用直接使用
+
+    被装饰的是 async def 函数时改用 asyncio：同时运行的协程数不超过 max_workers。
+    在运行中的事件循环内调用返回可等待对象（stream=True 时返回异步生成器），
+    在同步代码中调用则自行创建事件循环并直接返回结果（或生成器）。
+    """
+    chunked = chunksize not in (None,1)
+    limited = timeout is not None or deadline is not None or return_exceptions
+    if backend not in (None,'auto','thread','process'):
+        raise ValueError(f"无效的 backend: {backend!r}，可用 'thread'、'process' 或 'auto'")
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            return _async_decorator(func)
+
+        def streaming(its,until,process):
+            return _rerun_on_broken(partial(stream_once,until=until,process=process),its,process and shared)
+
+        def stream_once(its,until,process):
+            workers = max_workers or _default_workers(process)
+            scaler = _Autoscaler(min_workers,workers,wrapper.workers) if autoscale else None
+            # 最长优先时在途任务数与工作数相同，任务一提交就开始执行，也让实测耗时接近真实耗时
+            size = window or (workers if cost is not None else 2 * workers)
+            # 进程池的单项超时从提交起算，在途任务不超过工作数，避免排队时间计入超时
+            size = min(size,workers) if process and timeout is not None else size
+            options = dict(scaler=scaler,timeout=timeout,deadline=until,return_exceptions=return_exceptions)
+            try:
+                with _executor(max_workers,process,shared,initializer,initargs,affinity) as executor:
+                    if chunked:
+                        run = partial(_stream_chunks,executor,sizer=_ChunkSizer(chunksize,chunk_time))
+                    else:
+                        run = partial(_stream,executor)
+                    if shm and process:
+                        run = partial(_stream_shm,run)
+                    if cost is not None:
+                        yield from _stream_lpt(run,func,its,size,ordered,cost,wrapper.costs,cost_key,**options)
+                    else:
+                        yield from run(func,its,size,ordered,**options)
+            finally:
+                if scaler:
+                    wrapper.workers = scaler.limit
+
+        def execute(its,until,process):
+            if stream:
+                return streaming(its,until,process)
+            if not ordered or chunked or autoscale or limited or (shm and process) or cost is not None:
+                return list(streaming(its,until,process))
+
+            def mapped(its):
+                with _executor(max_workers,process,shared,initializer,initargs,affinity) as executor:
+                    # futures = [ executor.submit(func, x) for x in its ]
+                    # results = [ future.result() for future in as_completed(futures)]
+                    yield from executor.map(func,its)
+            return [ furture for furture in _rerun_on_broken(mapped,its,process and shared) ]
+
         @wraps(func)
         def wrapper(iterable):
             its = iterable if isinstance(iterable,Iterable) else [iterable]
+            until = None if deadline is None else perf_counter() + deadline
+            if wrapper.backend is not None:
+                return execute(its,until,wrapper.backend == 'process')
 
-            pool = ProcessPoolExecutor if use_process else ThreadPoolExecutor
+            its = iter(its)
+            # 试跑的并发不超过 max_workers：max_workers=1 常用于非线程安全的函数
+            head,process = _profile(func,its,min(max_workers or _default_workers(False),4),return_exceptions,initializer,initargs,
+                                    timeout,until,wrapper.costs,cost_key)
+            if process is None:
+                return iter([]) if stream else []
+            process = process and _picklable(func)
+            wrapper.backend = 'process' if process else 'thread'
+            rest = execute(its,until,process)
+            return chain(head,rest) if stream else head + rest
+        wrapper.workers = None
+        wrapper.costs = {} if cost == 'learn' else None
+        wrapper.backend = None if backend == 'auto' else backend or ('process' if use_process else 'thread')
+        return wrapper
 
-            with pool(max_workers=max_workers) as executor:
-                # futures = [ executor.submit(func, x) for x in its ]
-                # results = [ future.result() for future in as_completed(futures)]
-                results = [ furture for furture in executor.map(func,its) ]
-            return results
+    def _async_decorator(func):
+        @wraps(func)
+        def wrapper(iterable):
+            its = iterable if isinstance(iterable,Iterable) else [iterable]
+            until = None if deadline is None else perf_counter() + deadline
+            workers = max_workers or _default_workers(False)
+            agen = _astream(func,its,workers,window or 2 * workers,ordered,timeout,until,return_exceptions)
+            running = _in_running_loop()
+            if stream:
+                return agen if running else _drive(agen)
+            return _acollect(agen) if running else asyncio.run(_acollect(agen))
         return wrapper
     return decorator if func is None else decorator(func)
 
+class _MicroBatcher:
+    """
+    把并发到达的单个调用合并成一次批量调用：每批的第一个调用者负责等待并执行，
+    最多等 max_wait 秒或攒满 max_size 个，其余调用者等待各自的结果
+    """
+    def __init__(self,func,max_size=64,max_wait=0.005):
+        update_wrapper(self,func)
+        self.func = func
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.cond = threading.Condition()
+        self.batch = []  # 正在攒的批次：[(参数, Future)]
+
+    def __call__(self,item):
+        future = Future()
+        with self.cond:
+            batch = self.batch
+            batch.append((item,future))
+            leader = len(batch) == 1
+            if len(batch) >= self.max_size:
+                self.batch = []  # 攒满即封口，之后的调用开启新批次
+                self.cond.notify_all()
+            if leader:
+                end = perf_counter() + self.max_wait
+                while self.batch is batch:
+                    left = end - perf_counter()
+                    if left <= 0:
+                        self.batch = []
+                        break
+                    self.cond.wait(left)
+        if leader:
+            self._run(batch)
+        return future.result()
+
+    def _run(self,batch):
+        try:
+            results = list(self.func([item for item,_ in batch]))
+            if len(results) != len(batch):
+                raise ValueError(f"批量函数返回 {len(results)} 个结果，应为 {len(batch)} 个")
+        except BaseException as e:
+            for _,future in batch:
+                future.set_exception(e)
+            return
+        for (_,future),result in zip(batch,results):
+            if isinstance(result,BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+def micro_batch(func=None,max_size=64,max_wait=0.005):
+    """
+    微批处理装饰器：被装饰的是批量函数（接收参数列表，按顺序返回结果列表），
+    装饰后按单个参数调用，max_wait 秒内或最多 max_size 个并发调用合并为一次批量调用，
+    每个调用者得到自己的结果；批量函数抛出的异常交给整批调用者，结果列表中的异常对象只交给对应的调用者
+    """
+    def decorator(func):
+        return _MicroBatcher(func,max_size,max_wait)
+    return decorator if func is None else decorator(func)
+
 trd = vic_execute(max_workers=10,use_process=0)
 for_ = vic_execute(max_workers=1,use_process=0)
 proc = vic_execute(max_workers=3,use_process=1)
@@ -35,7 +840,7 @@ if __name__ == "__main__":
     t=time()
     add(range(100))
     print(time()-t)
-    
+
     @trd
     def add(x):
         sleep(0.1)
@@ -44,13 +849,110 @@ if __name__ == "__main__":
     t=time()
     add(range(100))
     print(time()-t)
-        
-        
+
+
     from time import sleep,time
     def add3(x):
         sleep(0.1)
         return x + 1
 
+    # 共享进程池：重复的小批量不再反复创建/销毁工作进程
+    def inc(x):
+        return x + 1
+    for shared in (False,True):
+        t=time()
+        for _ in range(20):
+            vic_execute(inc,max_workers=3,use_process=1,shared=shared)(range(10))
+        print(f"shared={shared}",time()-t)
+
+    # 自动分批：廉价函数在进程池中的吞吐
+    for chunksize in (None,'auto'):
+        t=time()
+        r = vic_execute(inc,max_workers=3,use_process=1,chunksize=chunksize)(range(100000))
+        print(f"chunksize={chunksize}",len(r),time()-t)
+
+    # 自动调整并发数：再次调用时从上次收敛的并发数开始
+    @vic_execute(max_workers=64,autoscale=True)
+    def wait_io(x):
+        sleep(0.01)
+        return x
+    for _ in range(3):
+        t=time()
+        wait_io(range(2000))
+        print(f"autoscale workers={wait_io.workers}",time()-t)
+
+    # 超时与部分结果：慢元素不再拖住整个调用
+    @vic_execute(max_workers=4,timeout=0.3,return_exceptions=True)
+    def slow(x):
+        sleep(1 if x == 3 else 0.05)
+        if x == 5:
+            raise ValueError(x)
+        return x
+    t=time()
+    print(slow(range(8)),time()-t)
+
+    # 最长任务优先：耗时差异大的批次，长任务不再拖在最后
+    def uneven(x):
+        sleep(x)
+        return x
+    costs = [0.05] * 30 + [0.6]
+    for c in (None,lambda x: x):
+        t=time()
+        vic_execute(uneven,max_workers=3,cost=c)(costs)
+        print(f"cost={'lpt' if c else None}",time()-t)
+
+    # 每个工作进程只加载一次重型状态
+    def load_table(n):
+        state.table = {i: i * i for i in range(n)}
+    def lookup(x):
+        return state.table[x]
+    t=time()
+    print(vic_execute(lookup,use_process=1,initializer=load_table,initargs=(10**6,))(range(10)),time()-t)
+
+    # 绑定 CPU：对比 CPU 密集任务在不同绑定方式下的吞吐
+    def spin(x):
+        return sum(i * i for i in range(20000))
+    n = len(os.sched_getaffinity(0)) if hasattr(os,'sched_getaffinity') else os.cpu_count()
+    for affinity in (None,'round_robin','numa'):
+        f = vic_execute(spin,max_workers=n,use_process=1,chunksize='auto',affinity=affinity)
+        f(range(n))  # 预热，启动工作进程
+        t=time()
+        f(range(5000))
+        print(f"affinity={affinity}",f"{5000 / (time()-t):.0f} items/s")
+
+    # 自动选择线程/进程：I/O 等待用线程，纯 Python 计算用进程
+    for work in (add3,spin):
+        f = vic_execute(work,max_workers=3,backend='auto')
+        t=time()
+        f(range(30))
+        print(f"{work.__name__}: backend={f.backend}",time()-t)
+
+    # 微批处理：多个线程的单次查询合并成批量查询
+    sizes = []
+    @micro_batch(max_size=32,max_wait=0.01)
+    def lookup_many(keys):
+        sizes.append(len(keys))
+        sleep(0.05)
+        return [k * 2 for k in keys]
+    t=time()
+    r = vic_execute(lookup_many,max_workers=64)(range(200))
+    print(r[:5],f"{len(sizes)} batches",time()-t)
+
+    # 流式处理：在途任务数受 window 限制，结果边算边取
+    t=time()
+    for i,r in enumerate(vic_execute(add3,max_workers=3,use_process=1,stream=True)(range(100000000))):
+        if i == 30:
+            break
+    print(r,time()-t)
+
+    # async def 函数：在事件循环中并发，不受线程数限制
+    @vic_execute(max_workers=1000)
+    async def fetch(x):
+        await asyncio.sleep(0.1)
+        return x + 1
+    t=time()
+    print(len(fetch(range(10000))),time()-t)
+
     t=time()
     print(proc(add3)(range(100000000)))
-    print(time()-t)
\ No newline at end of file
+    print(time()-t)